@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from django.contrib.messages import constants as messages
 from dotenv import load_dotenv
 
@@ -109,6 +110,78 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chat write-behind: when greater than 0, chat messages are buffered per room for this
+# many seconds and persisted with a single bulk_create. 0 keeps one INSERT per message.
+CHAT_WRITE_BEHIND_WINDOW = float(os.environ.get('CHAT_WRITE_BEHIND_WINDOW', 0))
+CHAT_WRITE_BEHIND_MAX_BATCH = 100
+
+# Number of chat messages rendered on the messaging page and returned per history request
+CHAT_HISTORY_PAGE_SIZE = 50
+
+# Messages replayed to a reconnecting chat socket per frame, and in total before the
+# client is told to reload instead
+CHAT_REPLAY_BATCH_SIZE = 100
+CHAT_REPLAY_MAX_MESSAGES = 1000
+
+# Typing indicators: seconds between coalesced "who is typing" snapshots per room, and
+# seconds after which a typer that stopped refreshing is dropped (clients likewise drop
+# a snapshot that is not re-sent within this time)
+CHAT_TYPING_TICK = 0.5
+CHAT_TYPING_TTL = 5
+
+# Seconds over which chat messages in a club are coalesced into one activity push to
+# members' notification sockets; 0 pushes every message
+CHAT_ACTIVITY_TICK = 1
+
+# Seconds a chat socket stays "online" without a heartbeat (clients send one every 25s)
+CHAT_PRESENCE_TTL = 60
+
+# Threads chat consumers use for database work. Keep it at or below the connections the
+# database allows per process; 0 falls back to asgiref's single thread-sensitive thread.
+CHAT_DB_WORKERS = int(os.environ.get('CHAT_DB_WORKERS', 8))
+
+# Cache shared by the web, chat and Celery processes; it holds unread counters, so a
+# per-process cache would let workers and web servers disagree
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+# The test runner gets a per-process cache: test user ids overlap real ones, so tests
+# must never read or write the shared cache's counters and club sets
+if sys.argv[1:2] == ['test']:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Seconds unread counters and chat unread snapshots stay cached; reconciliation and
+# expiry bound how long any drift can last
+UNREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Upcoming events shown on a club's page
+CLUB_UPCOMING_EVENTS = 5
+
+# Seconds a club's last event change is remembered for calendar ETag/Last-Modified headers
+EVENT_CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Members per page of the club roster endpoint
+CLUB_ROSTER_PAGE_SIZE = 50
+
+# Seconds a user's cached set of club ids is kept; membership and club changes replace it sooner
+USER_CLUBS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds exact page-total counts are cached by keyset pagination
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+
+# On PostgreSQL, page totals at or above this many rows use the planner's estimate instead of a count
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+# Seconds the admin dashboard chart series are cached; membership changes clear them sooner
+ADMIN_STATS_CACHE_TIMEOUT = 60 * 10
+
+# Seconds a rendered notification dropdown is reused; it is also replaced whenever the
+# user's notifications change, so this only bounds how stale its "x ago" times get
+NOTIFICATION_DROPDOWN_CACHE_TIMEOUT = 300
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -123,6 +196,10 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',
         },
+        # Keep connections open between requests and chat DB calls (the CHAT_DB_WORKERS
+        # threads reuse theirs); health checks drop any the pooler has closed
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -239,6 +316,29 @@ CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Example using Redis
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Notifications created per batch when a document or event is fanned out to club members
+NOTIFICATION_FANOUT_BATCH_SIZE = 500
+
+# Read notifications older than this are deleted by the prune_notifications task
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+
+# Newest notifications kept per user; older ones are pruned even when unread
+NOTIFICATION_MAX_PER_USER = int(os.environ.get('NOTIFICATION_MAX_PER_USER', 200))
+
+# Primary-key range deleted per statement when pruning, keeping each lock short
+NOTIFICATION_PRUNE_BATCH_SIZE = 1000
+
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-unread-counters': {
+        'task': 'clubs.tasks.reconcile_unread_counters',
+        'schedule': 60 * 60,  # hourly
+    },
+    'prune-notifications': {
+        'task': 'clubs.tasks.prune_notifications',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
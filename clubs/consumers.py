@@ -5,9 +5,15 @@ import logging
 from django.template.loader import render_to_string
 from django.core.mail import EmailMessage
 from asgiref.sync import sync_to_async
-from DjangoProject24 import settings
+from django.conf import settings
 import re
-from clubs.models import Message, Club
+from clubs.models import Message, Club, ClubReadCursor
+from clubs.services.realtime import chat_user_group, club_activity_group, notification_user_group
+from clubs.services.message_buffer import RoomMessageBuffer, write_behind_window
+from clubs.services.typing import RoomTypingAggregator
+from clubs.services.presence import get_presence_registry
+from clubs.services.db import database_sync_to_async
+from clubs.services.unread import read_cursors
 from django.contrib.auth import get_user_model
 
 logger = logging.getLogger(__name__)
@@ -60,45 +66,63 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             logger.info(f"User '{self.user.username}' trying to connect to room '{self.room_name}' (Club ID: {self.club_id})")
 
-            # Check if user is a member of the club
-            is_member = await self._check_user_membership()
-            if not is_member:
+            # Resolve the club and the user's membership once; both are cached for the
+            # lifetime of the socket and revoked via the per-user group below.
+            self.club = await self._get_club(self.club_id)
+            if self.club is None:
+                logger.error(f"Club with ID {self.club_id} not found for membership check.")
+                await self.close()
+                return
+
+            self.is_member = await self._check_user_membership()
+            if not self.is_member:
                 logger.warning(f"User '{self.user.username}' denied connection to '{self.room_name}': not a member.")
                 await self.close()
                 return
 
+            self.user_group_name = chat_user_group(self.user.pk)
+
             try:
                 await self.channel_layer.group_add(
                     self.room_group_name,
                     self.channel_name
                 )
+                await self.channel_layer.group_add(
+                    self.user_group_name,
+                    self.channel_name
+                )
                 await self.accept()
                 logger.info(f"User '{self.user.username}' connected to room '{self.room_name}'")
             except AttributeError:
                 logger.error("Channel layer is improperly configured or unavailable.")
                 await self.close()
+                return
+
+            await self._join_presence()
+
+            # A reconnecting client sends the last message id it has seen; stream what it
+            # missed before any live traffic queued for this channel is dispatched.
+            query = urllib.parse.parse_qs(self.scope.get('query_string', b'').decode())
+            last_seen = query.get('last_seen_message_id', [None])[0]
+            if last_seen:
+                await self._replay_since(last_seen)
         else:
             client_ip = self.scope.get('client', [None])[0]
             logger.warning(f"Unauthenticated connection attempt from IP: {client_ip}")
             await self.close()
 
-    @sync_to_async
+    @database_sync_to_async
     def _get_club(self, club_id):
         try:
             return Club.objects.get(id=club_id)
         except Club.DoesNotExist:
             return None
 
-    @sync_to_async
+    @database_sync_to_async
     def _check_user_membership(self):
-        if not hasattr(self, 'club_id'): # Should have been set in connect
+        if getattr(self, 'club', None) is None: # Should have been set in connect
              return False
-        try:
-            club = Club.objects.get(id=self.club_id)
-            return club.is_user_member(self.user)
-        except Club.DoesNotExist:
-            logger.error(f"Club with ID {self.club_id} not found for membership check.")
-            return False
+        return self.club.is_user_member(self.user)
 
 
     async def disconnect(self, close_code):
@@ -108,30 +132,98 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     self.room_group_name,
                     self.channel_name
                 )
+                RoomTypingAggregator.stop_typing(self.room_group_name, self.channel_name)
+                if hasattr(self, 'presence'):
+                    left = await self.presence.leave(self.room_group_name, self.channel_name)
+                    if left:
+                        await self._broadcast_presence_delta(left=[left])
+                if getattr(self, 'is_member', False) and getattr(self, 'last_delivered_id', None) is not None:
+                    await self._advance_read_cursor(self.last_delivered_id)
+                if hasattr(self, 'user_group_name'):
+                    await self.channel_layer.group_discard(
+                        self.user_group_name,
+                        self.channel_name
+                    )
                 logger.info(f"User '{getattr(self.user, 'username', 'Unknown')}' disconnected from room '{self.room_name}'")
         except AttributeError as e:
             logger.error(f"Channel layer misconfiguration during disconnection: {str(e)}")
         except Exception as e:
             logger.error(f"Error during WebSocket disconnection: {str(e)}")
 
-    @sync_to_async
-    def _save_message(self, club_id, sender_user, content, temp_id):
+    async def _join_presence(self):
+        """Register this socket as online, send the room snapshot and announce the user if new."""
+        self.presence = get_presence_registry(self.channel_layer)
+        newly_online = await self.presence.join(
+            self.room_group_name, self.channel_name, self.user.pk, self.user.username
+        )
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'users': await self.presence.online(self.room_group_name),
+        }))
+        if newly_online:
+            await self._broadcast_presence_delta(joined=[self.user.username])
+
+    async def _broadcast_presence_delta(self, joined=(), left=()):
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'presence_delta',
+            'text': json.dumps({
+                'type': 'presence_delta',
+                'joined': list(joined),
+                'left': list(left),
+            }),
+        })
+
+    @database_sync_to_async
+    def _advance_read_cursor(self, message_id):
+        # Messages delivered live were seen; record that once per socket instead of per message
+        ClubReadCursor.advance(self.user.pk, self.club_id, message_id)
+
+    @database_sync_to_async
+    def _get_messages_after(self, message_id, limit):
+        page, has_more = self.club.get_message_page(after=message_id, limit=limit)
+        return [message.to_chat_payload() for message in page], has_more
+
+    async def _replay_since(self, last_seen_message_id):
+        """Send messages newer than last_seen_message_id in bounded batches."""
+        try:
+            cursor = int(last_seen_message_id)
+        except (TypeError, ValueError):
+            await self.send_error("Invalid last_seen_message_id")
+            return
+
+        batch_size = settings.CHAT_REPLAY_BATCH_SIZE
+        remaining = settings.CHAT_REPLAY_MAX_MESSAGES
+        self.replayed_ids = set()
+        while True:
+            payloads, has_more = await self._get_messages_after(cursor, min(batch_size, remaining))
+            remaining -= len(payloads)
+            truncated = has_more and remaining <= 0
+            await self.send(text_data=json.dumps({
+                'type': 'replay',
+                'messages': payloads,
+                'done': not has_more or truncated,
+                # Too far behind to catch up incrementally; the client should reload the page
+                'truncated': truncated,
+            }))
+            self.replayed_ids.update(payload['id'] for payload in payloads)
+            if payloads:
+                self.last_delivered_id = payloads[-1]['id']
+            if not has_more or truncated:
+                return
+            cursor = payloads[-1]['id']
+
+    @database_sync_to_async
+    def _save_message(self, content):
+        # Membership was resolved on connect and is revoked by push, so no
+        # authorization query is needed here.
         try:
-            club = Club.objects.get(id=club_id)
-            # Validate sender membership again, just in case
-            if not club.is_user_member(sender_user):
-                logger.warning(f"Message save denied: User {sender_user} not a member of club {club_id}.")
-                return None, "User is not a member of this club."
-
-            message_obj = Message.objects.create(
-                club=club,
-                sender=sender_user,
+            message_obj = Message(
+                club=self.club,
+                sender=self.user,
                 content=content
             )
+            message_obj.save(validate_membership=False)
             return message_obj, None
-        except Club.DoesNotExist:
-            logger.error(f"Club with ID {club_id} not found when trying to save message.")
-            return None, "Club not found."
         except Exception as e:
             logger.error(f"Error saving message to database: {str(e)}")
             return None, f"Database error: {str(e)}"
@@ -168,53 +260,53 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }))
                 return
 
-            # Save the message to the database
-            saved_message, error_msg = await self._save_message(self.club_id, self.user, message_content, client_temp_id)
-
-            if error_msg or not saved_message:
-                logger.error(f"Failed to save message from {self.user.username}: {error_msg}")
+            if not self.is_member:
                 await self.send(text_data=json.dumps({
-                    "error": f"Could not save message: {error_msg}",
+                    "error": "You are no longer a member of this club.",
                     "type": "error",
                     "temp_id": client_temp_id
                 }))
                 return
 
-            # Prepare message data for broadcast, including database ID and timestamp
-            message_data_for_broadcast = {
-                'type': 'send_message', # This is the type for the group_send handler
-                'message_id': saved_message.id,
-                'content': saved_message.content,
-                'username': saved_message.sender.username,
-                'timestamp': saved_message.timestamp.isoformat(),
-                'temp_id': client_temp_id, # Include temp_id for client reconciliation
-                'sender_channel_name': self.channel_name # For potential future use, not strictly needed if client handles duplicates
-            }
+            # Optionally hand the message to the room's write-behind buffer, which
+            # persists in batches and broadcasts (or reports errors) per temp_id
+            if write_behind_window() > 0:
+                await RoomMessageBuffer.for_room(self.room_group_name).add(self, message_content, client_temp_id)
+                return
 
-            # Broadcast message to the room group
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                message_data_for_broadcast
-            )
+            # Save the message to the database
+            saved_message, error_msg = await self._save_message(message_content)
+
+            if error_msg or not saved_message:
+                logger.error(f"Failed to save message from {self.user.username}: {error_msg}")
+                await self.send_error(f"Could not save message: {error_msg}", client_temp_id)
+                return
+
+            await self.broadcast_message(saved_message, client_temp_id)
 
             # Optional: Email notification (if needed, but not central to this change)
             # recipient_email = data.get("recipient_email")
             # if recipient_email: ...
 
+        elif message_type == 'resume':
+            await self._replay_since(data.get('last_seen_message_id'))
+
+        elif message_type == 'heartbeat':
+            # Keeps this socket's presence entry alive and expires sockets that went silent
+            await self.presence.heartbeat(self.room_group_name, self.channel_name)
+            expired = await self.presence.sweep(self.room_group_name)
+            if expired:
+                await self._broadcast_presence_delta(left=expired)
+
         elif message_type == 'typing':
             typing_status = data.get("typing", False)
             if not self.user or not self.user.is_authenticated:
                 logger.warning("Unauthenticated user tried to send typing indicator.")
                 return
 
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_typing', # This is the type for the group_send handler
-                    'typing': typing_status,
-                    'username': self.user.username,
-                    'sender_channel_name': self.channel_name # Exclude sender from seeing their own typing
-                }
+            # Typing frames only update the room's aggregator, which publishes coalesced snapshots
+            RoomTypingAggregator.for_room(self.room_group_name, self.channel_layer).set_typing(
+                self.channel_name, self.user.username, bool(typing_status)
             )
         else:
             logger.warning(f"Received unexpected WebSocket data type: {message_type}")
@@ -225,24 +317,132 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }))
 
 
-    async def user_typing(self, event):
-        # This method handles the 'user_typing' event from group_send
-        # Don't send typing indicator back to the user who is typing
-        if self.channel_name != event.get('sender_channel_name'):
+    async def send_error(self, error, temp_id=None):
+        """Send an error frame to this socket, echoing temp_id for client-side reconciliation."""
+        try:
             await self.send(text_data=json.dumps({
-                'type': 'typing', # type for client-side handling
-                'typing': event['typing'],
-                'username': event['username'],
+                "error": error,
+                "type": "error",
+                "temp_id": temp_id
             }))
+        except Exception as e:
+            logger.error(f"Could not deliver error to '{getattr(self.user, 'username', 'Unknown')}': {str(e)}")
+
+    async def broadcast_message(self, saved_message, temp_id):
+        """Broadcast a persisted message to the room group."""
+        # The client-facing frame is encoded once here; every receiver forwards the
+        # text unchanged instead of rebuilding and re-encoding it
+        frame = json.dumps({
+            'type': 'chat_message', # type for client-side handling
+            'id': saved_message.id,
+            'message': saved_message.content, # 'message' is the key client expects for content
+            'username': self.user.username,
+            'timestamp': saved_message.timestamp.isoformat(),
+            'temp_id': temp_id, # Pass back temp_id for client reconciliation
+        })
+
+        # Broadcast message to the room group
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'send_message', # This is the type for the group_send handler
+                'message_id': saved_message.id, # Lets receivers skip messages already replayed
+                'text': frame,
+            }
+        )
+
+    async def typing_snapshot(self, event):
+        # This method handles the coalesced 'typing_snapshot' event from RoomTypingAggregator
+        # The frame is pre-encoded; the client hides its own username from the list
+        await self.send(text_data=event['text'])
+
+    async def presence_delta(self, event):
+        # Pre-encoded 'presence_delta' frame listing users who came online or went offline
+        await self.send(text_data=event['text'])
 
     async def send_message(self, event):
         # This method handles the 'send_message' event from group_send
-        # It sends the confirmed message (saved in DB) to the WebSocket client
+        # It forwards the pre-encoded confirmed message (saved in DB) to the WebSocket client
+        if event['message_id'] in getattr(self, 'replayed_ids', ()):
+            return # Already delivered by a resume replay
+        await self.send(text_data=event['text'])
+        self.last_delivered_id = event['message_id']
+
+    async def membership_revoked(self, event):
+        # Sent to the per-user group when a Membership is declined or deleted
+        if event.get('club_id') != self.club_id or self.user.pk == self.club.admin_id:
+            return
+        self.is_member = False
+        logger.info(f"Membership of '{self.user.username}' in '{self.room_name}' revoked; closing socket.")
         await self.send(text_data=json.dumps({
-            'type': 'chat_message', # type for client-side handling
-            'id': event['message_id'],
-            'message': event['content'], # 'message' is the key client expects for content
-            'username': event['username'],
-            'timestamp': event['timestamp'],
-            'temp_id': event.get('temp_id') # Pass back temp_id for client reconciliation
+            'type': 'error',
+            'error': 'Your membership in this club has been revoked.',
         }))
+        await self.close(code=4003)
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Per-user socket that keeps the navbar badge and dropdown current without polling.
+
+    Pushes arrive on the user's notification group (new or merged notifications, all read)
+    and on the chat activity group of every club whose chat the user reads.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if not (self.user and self.user.is_authenticated):
+            client_ip = self.scope.get('client', [None])[0]
+            logger.warning(f"Unauthenticated notification socket attempt from IP: {client_ip}")
+            await self.close()
+            return
+
+        self.user_group_name = notification_user_group(self.user.pk)
+        self.activity_groups = {club_activity_group(club_id) for club_id in await self._get_club_ids()}
+        try:
+            for group_name in (self.user_group_name, *self.activity_groups):
+                await self.channel_layer.group_add(group_name, self.channel_name)
+            await self.accept()
+        except AttributeError:
+            logger.error("Channel layer is improperly configured or unavailable.")
+            await self.close()
+
+    @database_sync_to_async
+    def _get_club_ids(self):
+        return list(read_cursors(self.user.pk))
+
+    async def disconnect(self, close_code):
+        try:
+            for group_name in (getattr(self, 'user_group_name', None), *getattr(self, 'activity_groups', ())):
+                if group_name:
+                    await self.channel_layer.group_discard(group_name, self.channel_name)
+        except Exception as e:
+            logger.error(f"Error during notification socket disconnect: {str(e)}")
+
+    async def receive(self, text_data):
+        pass  # Push-only; marking read goes through the mark_notifications_read view
+
+    async def notification_push(self, event):
+        # Pre-encoded 'notification' or 'notifications_read' frame
+        await self.send(text_data=event['text'])
+
+    async def club_activity(self, event):
+        # Pre-encoded 'chat_activity' frame; the user's own messages are not unread for them
+        own = event['senders'].get(str(self.user.pk), 0)
+        if not own:
+            await self.send(text_data=event['text'])
+            return
+        frame = json.loads(event['text'])
+        frame['new_messages'] -= own
+        if frame['new_messages'] > 0:
+            await self.send(text_data=json.dumps(frame))
+
+    async def activity_subscription(self, event):
+        # Sent to the user's group when a membership is approved, declined or removed
+        group_name = club_activity_group(event['club_id'])
+        if event['subscribed']:
+            self.activity_groups.add(group_name)
+            await self.channel_layer.group_add(group_name, self.channel_name)
+        elif group_name in self.activity_groups:
+            self.activity_groups.discard(group_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
@@ -1,6 +1,11 @@
-from .models import Notification
+from .services.unread import unread_chat_summary, unread_notification_count
  
 def unread_notifications(request):
     if request.user.is_authenticated:
-        return {'unread_notifications_count': Notification.objects.filter(user=request.user, is_read=False).count()}
-    return {'unread_notifications_count': 0} 
\ No newline at end of file
+        # Both come from the cache when it is warm, so rendering costs no queries
+        unread_chat = unread_chat_summary(request.user)
+        return {
+            'unread_notifications_count': unread_notification_count(request.user.id) + len(unread_chat),
+            'unread_chat_clubs': unread_chat,
+        }
+    return {'unread_notifications_count': 0, 'unread_chat_clubs': []}
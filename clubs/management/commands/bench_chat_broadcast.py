@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from clubs.consumers import ChatConsumer
+
+
+class _Receiver(ChatConsumer):
+    """ChatConsumer whose socket writes are discarded, so only handler CPU is measured."""
+
+    async def base_send(self, message):
+        pass
+
+
+async def _legacy_send_message(consumer, event):
+    # Handler as it was before frames were encoded once: rebuild the dict and
+    # re-encode it for every receiver in the room
+    await consumer.send(text_data=json.dumps({
+        'type': 'chat_message',
+        'id': event['message_id'],
+        'message': event['content'],
+        'username': event['username'],
+        'timestamp': event['timestamp'],
+        'temp_id': event.get('temp_id')
+    }))
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the per-message CPU cost of chat broadcast fan-out against room size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-sizes', default='1,10,50,100,200,500',
+                            help='Comma-separated numbers of listeners per room')
+        parser.add_argument('--messages', type=int, default=200, help='Messages broadcast per room size')
+        parser.add_argument('--message-length', type=int, default=200, help='Characters per message')
+
+    def handle(self, *args, **options):
+        room_sizes = [int(size) for size in options['room_sizes'].split(',')]
+        content = 'x' * options['message_length']
+        timestamp = timezone.now().isoformat()
+
+        self.stdout.write(f"{'listeners':>10} {'legacy us/msg':>15} {'encode-once us/msg':>20} {'speedup':>9}")
+        for size in room_sizes:
+            legacy = asyncio.run(self._run_legacy(size, options['messages'], content, timestamp))
+            encode_once = asyncio.run(self._run_encode_once(size, options['messages'], content, timestamp))
+            self.stdout.write(
+                f"{size:>10} {legacy:>15.1f} {encode_once:>20.1f} {legacy / encode_once:>8.1f}x"
+            )
+
+    async def _run_legacy(self, size, count, content, timestamp):
+        receivers = [_Receiver() for _ in range(size)]
+        started = time.process_time()
+        for message_id in range(count):
+            event = {
+                'type': 'send_message',
+                'message_id': message_id,
+                'content': content,
+                'username': 'bench',
+                'timestamp': timestamp,
+                'temp_id': f'temp_{message_id}',
+            }
+            for receiver in receivers:
+                await _legacy_send_message(receiver, event)
+        return (time.process_time() - started) / count * 1e6
+
+    async def _run_encode_once(self, size, count, content, timestamp):
+        receivers = [_Receiver() for _ in range(size)]
+        started = time.process_time()
+        for message_id in range(count):
+            # Sender side: one encode per message, as in ChatConsumer.broadcast_message
+            event = {
+                'type': 'send_message',
+                'message_id': message_id,
+                'text': json.dumps({
+                    'type': 'chat_message',
+                    'id': message_id,
+                    'message': content,
+                    'username': 'bench',
+                    'timestamp': timestamp,
+                    'temp_id': f'temp_{message_id}',
+                }),
+            }
+            for receiver in receivers:
+                await receiver.send_message(event)
+        return (time.process_time() - started) / count * 1e6
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from clubs.consumers import ChatConsumer
+from clubs.models import Club, Membership
+
+User = get_user_model()
+
+
+class RoundTripDelay:
+    """Sleeps before every query to emulate the network round trip to a remote database."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure chat consumer database throughput (club lookup, membership check, message save) '
+        'against the number of concurrent sockets, for the thread-sensitive path and the CHAT_DB_WORKERS pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,4,16,32',
+                            help='Comma-separated numbers of sockets issuing database calls at once')
+        parser.add_argument('--operations', type=int, default=5, help='Connect+send cycles per socket')
+        parser.add_argument('--workers', type=int, default=8, help='CHAT_DB_WORKERS for the pooled run')
+        parser.add_argument('--round-trip-ms', type=float, default=2.0,
+                            help='Latency added to every query to emulate a remote database')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        delay = RoundTripDelay(options['round_trip_ms'] / 1000)
+
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # Shared-cache in-memory SQLite fails concurrent writers with "table is locked";
+            # a file database with a busy timeout makes them wait like a real server would
+            temp_dir = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'bench_chat_db.sqlite3')
+            connection.settings_dict.setdefault('OPTIONS', {})['timeout'] = 30
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        connection_created.connect(delay.install)
+        try:
+            users, club = self._seed(max(levels))
+            self.stdout.write(f"{'sockets':>8} {'thread-sensitive ops/s':>24} {'pool ops/s':>12} {'speedup':>9}")
+            for level in levels:
+                legacy = self._measure(users[:level], club, options['operations'], 0)
+                pooled = self._measure(users[:level], club, options['operations'], options['workers'])
+                self.stdout.write(f"{level:>8} {legacy:>24.1f} {pooled:>12.1f} {pooled / legacy:>8.1f}x")
+        finally:
+            connection_created.disconnect(delay.install)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, count):
+        admin = User.objects.create_user(username='bench_admin', password='bench')
+        club = Club.objects.create(name='Bench Club', description='Benchmark', admin=admin)
+        users = [User.objects.create_user(username=f'bench_{i}', password='bench') for i in range(count)]
+        Membership.objects.bulk_create([Membership(user=user, club=club, status='approved') for user in users])
+        return users, club
+
+    def _measure(self, users, club, operations, workers):
+        with override_settings(CHAT_DB_WORKERS=workers):
+            started = time.perf_counter()
+            asyncio.run(self._drive(users, club, operations))
+            elapsed = time.perf_counter() - started
+        return len(users) * operations / elapsed
+
+    async def _drive(self, users, club, operations):
+        async def socket(user):
+            consumer = ChatConsumer()
+            consumer.user = user
+            for _ in range(operations):
+                # The same database calls a socket makes to connect and post one message
+                consumer.club = await consumer._get_club(club.id)
+                await consumer._check_user_membership()
+                _, error = await consumer._save_message('benchmark')
+                if error:
+                    raise RuntimeError(error)
+
+        await asyncio.gather(*(socket(user) for user in users))
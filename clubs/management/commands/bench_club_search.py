@@ -0,0 +1,71 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from clubs.models import Club
+from clubs.services.search import autocomplete_clubs, search_clubs
+
+User = get_user_model()
+
+WORDS = (
+    'chess robotics drama debate chemistry astronomy coding football basketball music choir jazz '
+    'photography film poetry writing hiking climbing cycling gardening cooking baking painting '
+    'sculpture dance theatre history philosophy economics finance biology physics mathematics '
+    'volunteering environment recycling gaming anime languages spanish french german chinese '
+    'swimming tennis badminton volleyball rugby cricket athletics yoga meditation entrepreneurship'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Measure club_list search and autocomplete latency against a seeded number of clubs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clubs', type=int, default=100000, help='Clubs to seed')
+        parser.add_argument('--queries', type=int, default=200, help='Queries timed per endpoint')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            temp_dir = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'bench_club_search.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            self._seed(options['clubs'], rng)
+            self.stdout.write(f"Seeded {options['clubs']} clubs in {time.perf_counter() - started:.1f}s")
+            prefixes = [rng.choice(WORDS)[:rng.randint(2, 6)] for _ in range(options['queries'])]
+            queries = [f"{rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(options['queries'])]
+            self._report('search (first page)', [lambda q=q: list(search_clubs(q)[:10]) for q in queries])
+            self._report('autocomplete', [lambda p=p: autocomplete_clubs(p) for p in prefixes])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, count, rng):
+        admin = User.objects.create_user(username='bench_admin', password='bench')
+        Club.objects.bulk_create([
+            Club(
+                name=f"{' '.join(rng.sample(WORDS, 2)).title()} Club {i}",
+                description=' '.join(rng.choices(WORDS, k=12)),
+                admin=admin,
+            )
+            for i in range(count)
+        ], batch_size=5000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE clubs_club")
+
+    def _report(self, label, calls):
+        timings = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(f"{label:>20}: p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, max {timings[-1]:.2f} ms")
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from clubs.models import Club, Membership, Message
+from clubs.routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+class QueryCounter:
+    """Counts queries on every database connection, including those opened by sync_to_async threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return round(ordered[rank], 3)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test ChatConsumer with R rooms of M WebSocket clients on the in-memory channel layer. '
+        'Runs against a throwaway test database and prints a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5, help='Number of chat rooms (clubs)')
+        parser.add_argument('--clients', type=int, default=20, help='Connected clients per room')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to drive traffic')
+        parser.add_argument('--message-rate', type=float, default=0.2,
+                            help='Chat messages per second sent by each client')
+        parser.add_argument('--typing-rate', type=float, default=0.5,
+                            help='Typing frames per second sent by each client')
+        parser.add_argument('--write-behind', type=float, default=None,
+                            help='Override CHAT_WRITE_BEHIND_WINDOW (seconds) for the run')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for send schedules')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        overrides = {'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}}
+        if options['write_behind'] is not None:
+            overrides['CHAT_WRITE_BEHIND_WINDOW'] = options['write_behind']
+
+        # Never seed load-test data into the real database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(**overrides):
+                rooms = self._seed(options['rooms'], options['clients'])
+                report = asyncio.run(self._run(rooms, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report['config'] = {key: options[key] for key in (
+            'rooms', 'clients', 'duration', 'message_rate', 'typing_rate', 'write_behind', 'seed'
+        )}
+        report['commit'] = self._git_commit()
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _seed(self, room_count, client_count):
+        rooms = []
+        for r in range(room_count):
+            admin = User.objects.create_user(username=f'loadtest_admin_{r}', password='loadtest')
+            club = Club.objects.create(name=f'Load Test Club {r}', description='Load test', admin=admin)
+            members = [User.objects.create_user(username=f'loadtest_{r}_{m}', password='loadtest')
+                       for m in range(client_count - 1)]
+            Membership.objects.bulk_create([
+                Membership(user=member, club=club, status='approved') for member in members
+            ])
+            rooms.append((club, [admin] + members))
+        return rooms
+
+    async def _run(self, rooms, options):
+        application = URLRouter(websocket_urlpatterns)
+        rng = random.Random(options['seed'])
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+
+        sent_at = {}
+        latencies = []
+        deliveries = 0
+        errors = 0
+        stop = asyncio.Event()
+
+        async def receive_loop(communicator):
+            nonlocal deliveries, errors
+            while True:
+                frame = json.loads(await communicator.receive_from(timeout=options['duration'] + 60))
+                if frame['type'] == 'chat_message':
+                    started = sent_at.get(frame.get('temp_id'))
+                    if started is not None:
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        deliveries += 1
+                elif frame['type'] == 'error':
+                    errors += 1
+
+        async def send_loop(communicator, client_id):
+            seq = 0
+            message_interval = 1 / options['message_rate'] if options['message_rate'] > 0 else None
+            typing_interval = 1 / options['typing_rate'] if options['typing_rate'] > 0 else None
+            next_message = rng.uniform(0, message_interval) if message_interval else float('inf')
+            next_typing = rng.uniform(0, typing_interval) if typing_interval else float('inf')
+            started = time.perf_counter()
+            while not stop.is_set():
+                elapsed = time.perf_counter() - started
+                wait = min(next_message, next_typing) - elapsed
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=wait)
+                        return
+                    except asyncio.TimeoutError:
+                        pass
+                elapsed = time.perf_counter() - started
+                if elapsed >= next_typing:
+                    await communicator.send_json_to({'type': 'typing', 'typing': True})
+                    next_typing += typing_interval
+                if elapsed >= next_message:
+                    temp_id = f'{client_id}:{seq}'
+                    seq += 1
+                    sent_at[temp_id] = time.perf_counter()
+                    await communicator.send_json_to({'type': 'chat_message', 'message': 'load test', 'temp_id': temp_id})
+                    next_message += message_interval
+
+        communicators = []
+        for club, users in rooms:
+            for user in users:
+                communicator = WebsocketCommunicator(application, f'/ws/chat/club_{club.id}/')
+                communicator.scope['user'] = user
+                connected, _ = await communicator.connect()
+                if not connected:
+                    raise RuntimeError(f'Client {user.username} could not connect to club {club.id}')
+                communicators.append(communicator)
+        connect_queries = counter.count
+
+        receivers = [asyncio.ensure_future(receive_loop(c)) for c in communicators]
+        senders = [asyncio.ensure_future(send_loop(c, i)) for i, c in enumerate(communicators)]
+        run_started = time.perf_counter()
+        await asyncio.sleep(options['duration'])
+        stop.set()
+        await asyncio.gather(*senders)
+
+        # Let in-flight messages drain before measuring
+        expected = len(sent_at) * options['clients']
+        drain_deadline = time.perf_counter() + 10
+        while deliveries + errors * options['clients'] < expected and time.perf_counter() < drain_deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - run_started
+        run_queries = counter.count - connect_queries
+
+        for task in receivers:
+            task.cancel()
+        await asyncio.gather(*receivers, return_exceptions=True)
+        for communicator in communicators:
+            await communicator.disconnect()
+        connection_created.disconnect(counter.install)
+
+        persisted = await sync_to_async(Message.objects.count)()
+        return {
+            'messages_sent': len(sent_at),
+            'messages_persisted': persisted,
+            'deliveries': deliveries,
+            'errors': errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'messages_per_second': round(persisted / elapsed, 2) if elapsed else None,
+            'deliveries_per_second': round(deliveries / elapsed, 2) if elapsed else None,
+            'broadcast_latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': round(max(latencies), 3) if latencies else None,
+            },
+            'db_queries_on_connect': connect_queries,
+            'db_queries_per_message': round(run_queries / persisted, 2) if persisted else None,
+            # ru_maxrss is reported in kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -135,26 +135,25 @@ class Command(BaseCommand):
 
         # Import Messages
         messages = data['data'].get('messages', {}).get('records', [])
-        for msg in messages:
-            club = Club.objects.filter(id=msg['club_id']).first()
-            sender = User.objects.filter(id=msg['sender_id']).first()
-            receiver = User.objects.filter(id=msg['receiver_id']).first() if msg['receiver_id'] else None
-            if not club or not sender:
-                continue
-            obj, created = Message.objects.get_or_create(
+        club_ids = set(Club.objects.values_list('id', flat=True))
+        user_ids = set(User.objects.values_list('id', flat=True))
+        to_ingest = [
+            Message(
                 id=msg['id'],
-                defaults={
-                    'club': club,
-                    'sender': sender,
-                    'receiver': receiver,
-                    'content': msg['content'],
-                    'timestamp': msg['timestamp'],
-                    'is_deleted': msg['is_deleted'],
-                }
+                club_id=msg['club_id'],
+                sender_id=msg['sender_id'],
+                receiver_id=msg['receiver_id'] if msg['receiver_id'] in user_ids else None,
+                content=msg['content'],
+                timestamp=msg['timestamp'],
+                is_deleted=msg['is_deleted'],
             )
-            if not created:
-                # Optionally update fields
-                pass
-        self.stdout.write(self.style.SUCCESS(f'Imported {len(messages)} messages'))
+            for msg in messages
+            if msg['club_id'] in club_ids and msg['sender_id'] in user_ids
+        ]
+        # Exported content was escaped when it was first saved; ids already present are skipped
+        created, rejected = Message.bulk_ingest(to_ingest, escape_content=False, ignore_conflicts=True)
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'Skipped {len(rejected)} messages from non-members'))
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(created)} messages'))
 
         self.stdout.write(self.style.SUCCESS('Database import completed!')) 
\ No newline at end of file
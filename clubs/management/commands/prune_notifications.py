@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from clubs.tasks import prune_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete read notifications older than the retention age and trim each user to the newest '
+        'NOTIFICATION_MAX_PER_USER rows, in small primary-key batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Delete read notifications older than this (default NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--max-per-user', type=int, default=None,
+                            help='Notifications kept per user (default NOTIFICATION_MAX_PER_USER)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per delete statement (default NOTIFICATION_PRUNE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        stats = prune_notifications(options['days'], options['max_per_user'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {stats['expired']} expired and {stats['over_cap']} over-cap notifications "
+            f"in {stats['seconds']}s ({stats['rows_per_second']} rows/sec)"
+        ))
@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from clubs.models import Event, Notification
 from clubs.utils.email_utils import send_html_email
+from clubs.services.realtime import push_notifications
+from clubs.services.unread import bump_notification_version, increment_unread
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,12 +36,17 @@ class Command(BaseCommand):
                             Notification(
                                 user=member.user,
                                 club=event.club,
+                                kind=Notification.KIND_EVENT_REMINDER,
+                                target_id=event.id,
                                 content=f"Reminder: '{event.title}' is happening {event.get_reminder_datetime().strftime('%B %d, %Y at %I:%M %p')} in {event.club.name}"
                             )
                         )
                     
                     if notifications_to_create:
                         Notification.objects.bulk_create(notifications_to_create)
+                        increment_unread([n.user_id for n in notifications_to_create])
+                        bump_notification_version([n.user_id for n in notifications_to_create])
+                        push_notifications(notifications_to_create)
                     
                     # Send email reminders (if user has email notifications enabled)
                     for member in club_members:
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0012_googlecalendartoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['club', 'timestamp', 'id'], name='clubs_msg_club_ts_id_idx'),
+        ),
+    ]
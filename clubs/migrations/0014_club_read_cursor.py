@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fold_message_notifications(apps, schema_editor):
+    """Create a read cursor per member and club from the per-message notifications, then drop those rows."""
+    Club = apps.get_model('clubs', 'Club')
+    ClubReadCursor = apps.get_model('clubs', 'ClubReadCursor')
+    Membership = apps.get_model('clubs', 'Membership')
+    Message = apps.get_model('clubs', 'Message')
+    Notification = apps.get_model('clubs', 'Notification')
+
+    latest = dict(
+        Message.objects.values('club_id').annotate(latest=models.Max('id')).values_list('club_id', 'latest')
+    )
+    # A reader with unread message notifications has read up to just before the oldest one
+    first_unread = {
+        (user_id, club_id): message_id
+        for user_id, club_id, message_id in Notification.objects.filter(message__isnull=False, is_read=False)
+        .values('user_id', 'club_id').annotate(first=models.Min('message_id'))
+        .values_list('user_id', 'club_id', 'first')
+    }
+    readers = set(Membership.objects.filter(status='approved').values_list('user_id', 'club_id'))
+    readers.update((admin_id, club_id) for club_id, admin_id in Club.objects.values_list('id', 'admin_id'))
+
+    ClubReadCursor.objects.bulk_create([
+        ClubReadCursor(
+            user_id=user_id,
+            club_id=club_id,
+            last_read_id=first_unread[(user_id, club_id)] - 1 if (user_id, club_id) in first_unread
+            else latest.get(club_id, 0),
+        )
+        for user_id, club_id in readers
+    ], batch_size=1000)
+    Notification.objects.filter(message__isnull=False).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0013_message_club_timestamp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClubReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_id', models.BigIntegerField(default=0, help_text='Id of the newest chat message the user has seen.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='clubs.club')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='club_read_cursors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'club'), name='clubs_read_cursor_user_club_uniq')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['club', 'id'], name='clubs_msg_club_id_idx'),
+        ),
+        migrations.RunPython(fold_message_notifications, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notification',
+            name='message',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0014_club_read_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='source_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_key', ''), _negated=True), fields=('user', 'source_key'), name='clubs_notification_user_source_uniq'),
+        ),
+    ]
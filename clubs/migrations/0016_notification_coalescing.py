@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0015_notification_source_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('', 'Other'), ('document', 'Document shared'), ('event', 'Event scheduled')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='last_actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), ('kind__in', ['document', 'event'])), fields=('user', 'club', 'kind'), name='clubs_notification_unread_kind_uniq'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+# Content patterns the notification_url filter used to route on, checked in the same order
+KIND_PATTERNS = [
+    ('membership_request', lambda c: 'has requested to join' in c),
+    ('membership_decision', lambda c: 'membership request' in c and ('approved' in c or 'rejected' in c)),
+    ('document', lambda c: 'new document' in c and 'has been shared' in c),
+    ('event', lambda c: 'new event' in c and 'scheduled for' in c),
+    ('event_reminder', lambda c: 'reminder:' in c and 'is happening' in c),
+]
+COALESCED_SUMMARIES = {'document': 'new documents', 'event': 'new events'}
+
+
+def backfill_kinds(apps, schema_editor):
+    """Classify untyped notifications from their text once, then merge unread duplicates of coalesced kinds."""
+    Club = apps.get_model('clubs', 'Club')
+    Notification = apps.get_model('clubs', 'Notification')
+
+    ids_by_kind = {kind: [] for kind, _ in KIND_PATTERNS}
+    for notification_id, content in Notification.objects.filter(kind='').values_list('id', 'content').iterator():
+        content = content.lower()
+        for kind, matches in KIND_PATTERNS:
+            if matches(content):
+                ids_by_kind[kind].append(notification_id)
+                break
+    for kind, ids in ids_by_kind.items():
+        for start in range(0, len(ids), 1000):
+            Notification.objects.filter(id__in=ids[start:start + 1000]).update(kind=kind)
+
+    club_names = dict(Club.objects.values_list('id', 'name'))
+    for kind, summary in COALESCED_SUMMARIES.items():
+        duplicates = (
+            Notification.objects.filter(kind=kind, is_read=False).values('user_id', 'club_id')
+            .annotate(rows=models.Count('id'), total=models.Sum('count'), keep=models.Max('id'))
+            .filter(rows__gt=1)
+        )
+        for group in duplicates:
+            Notification.objects.filter(id=group['keep']).update(
+                count=group['total'],
+                content=f"{group['total']} {summary} in {club_names.get(group['club_id'], '')}"[:255],
+            )
+            Notification.objects.filter(
+                user_id=group['user_id'], club_id=group['club_id'], kind=kind, is_read=False
+            ).exclude(id=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0016_notification_coalescing'),
+    ]
+
+    operations = [
+        # Dropped while backfilled rows are merged, then restored
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='clubs_notification_unread_kind_uniq',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='target_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('', 'Other'), ('membership_request', 'Membership requested'), ('membership_decision', 'Membership approved or rejected'), ('document', 'Document shared'), ('event', 'Event scheduled'), ('event_reminder', 'Event reminder')], default='', max_length=20),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), ('kind__in', ['document', 'event'])), fields=('user', 'club', 'kind'), name='clubs_notification_unread_kind_uniq'),
+        ),
+    ]
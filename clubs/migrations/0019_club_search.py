@@ -0,0 +1,90 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    CREATE FUNCTION clubs_club_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER clubs_club_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description ON clubs_club
+    FOR EACH ROW EXECUTE FUNCTION clubs_club_search_vector_trigger()
+    """,
+    "UPDATE clubs_club SET name = name",
+    "CREATE INDEX clubs_club_search_idx ON clubs_club USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS clubs_club_search_idx",
+    "DROP TRIGGER IF EXISTS clubs_club_search_vector_update ON clubs_club",
+    "DROP FUNCTION IF EXISTS clubs_club_search_vector_trigger()",
+]
+
+# External-content FTS5 index over clubs_club. SQLite rebuilds a table (dropping its
+# triggers) when a later migration alters it in ways ALTER TABLE cannot, so such
+# migrations must recreate these triggers.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE clubs_club_fts USING fts5(
+        name, description, content='clubs_club', content_rowid='id',
+        tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER clubs_club_fts_insert AFTER INSERT ON clubs_club BEGIN
+        INSERT INTO clubs_club_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER clubs_club_fts_delete AFTER DELETE ON clubs_club BEGIN
+        INSERT INTO clubs_club_fts(clubs_club_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER clubs_club_fts_update AFTER UPDATE OF name, description ON clubs_club BEGIN
+        INSERT INTO clubs_club_fts(clubs_club_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO clubs_club_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO clubs_club_fts(clubs_club_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS clubs_club_fts_insert",
+    "DROP TRIGGER IF EXISTS clubs_club_fts_delete",
+    "DROP TRIGGER IF EXISTS clubs_club_fts_update",
+    "DROP TABLE IF EXISTS clubs_club_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='club',
+            name='search_vector',
+            field=SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
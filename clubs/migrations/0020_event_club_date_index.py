@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0019_club_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['club', 'event_date'], name='clubs_event_club_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_sources(apps, schema_editor):
+    """Record the source each existing notification carries; earlier sources of merged rows are not recoverable."""
+    Notification = apps.get_model('clubs', 'Notification')
+    NotificationSource = apps.get_model('clubs', 'NotificationSource')
+    rows = Notification.objects.exclude(source_key='').values_list('user_id', 'source_key').iterator()
+    batch = []
+    for user_id, source_key in rows:
+        batch.append(NotificationSource(user_id=user_id, source_key=source_key))
+        if len(batch) == 1000:
+            NotificationSource.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    NotificationSource.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0020_event_club_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'source_key'), name='clubs_notif_source_user_key_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_sources, migrations.RunPython.noop),
+    ]
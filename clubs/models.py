@@ -1,9 +1,13 @@
 from django.utils.html import escape
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.urls import reverse
+from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
@@ -74,6 +78,9 @@ class Club(models.Model):
         verbose_name="Is Active",
         help_text="Mark as false to deactivate the club instead of deleting it."
     )
+    # Weighted name/description tsvector for PostgreSQL full-text search, maintained by a
+    # database trigger (see migration 0019); unused on SQLite, which searches clubs_club_fts
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -83,9 +90,13 @@ class Club(models.Model):
 
     def is_user_member(self, user):
         """Check if a user is a member of this club (including admin)"""
-        if user == self.admin:
+        # Compare ids so the admin row is not fetched just to answer this
+        if user.pk is None:
+            return False
+        if user.pk == self.admin_id:
             return True
-        return self.memberships.filter(user=user, status='approved').exists()
+        from .services.membership import user_club_ids
+        return self.id in user_club_ids(user.pk)
 
     def get_all_members(self):
         """Get all members of the club including the admin"""
@@ -103,6 +114,65 @@ class Club(models.Model):
             members.insert(0, admin_membership)
         return members
 
+    def approved_members(self):
+        """Approved memberships other than the admin's, with each user's profile loaded."""
+        return (
+            self.memberships.filter(status='approved').exclude(user_id=self.admin_id)
+            .select_related('user__profile')
+        )
+
+    def roster_summary(self, limit=7):
+        """
+        The member count (including the admin) and the first `limit` members, admin first,
+        for the club page. The full roster is paged by the club_roster endpoint.
+        """
+        members = self.approved_members()
+        return {
+            'count': members.count() + 1,
+            'members': [self.admin] + [m.user for m in members.order_by('applied_at', 'id')[:limit - 1]],
+        }
+
+    def upcoming_events(self, limit=5):
+        """The next `limit` events from now, served by the (club, event_date) index."""
+        return self.events.filter(event_date__gte=timezone.now()).order_by('event_date', 'id')[:limit]
+
+    def events_between(self, start, end):
+        """Events in the [start, end) window, oldest first."""
+        return self.events.filter(event_date__gte=start, event_date__lt=end).order_by('event_date', 'id')
+
+    def get_message_page(self, before=None, after=None, limit=50):
+        """
+        Return a keyset page of chat history as (messages, has_more).
+
+        Pages are ordered by (timestamp, id) and served by the (club, timestamp, id)
+        index. `before`/`after` are message ids used as cursors; messages are always
+        returned oldest first.
+        """
+        messages = self.messages.select_related('sender__profile')
+        cursor_id = before if before is not None else after
+        if cursor_id is not None:
+            cursor_ts = self.messages.filter(id=cursor_id).values_list('timestamp', flat=True).first()
+            if cursor_ts is None:
+                return [], False
+            if before is not None:
+                messages = messages.filter(
+                    models.Q(timestamp__lt=cursor_ts) | models.Q(timestamp=cursor_ts, id__lt=cursor_id)
+                )
+            else:
+                messages = messages.filter(
+                    models.Q(timestamp__gt=cursor_ts) | models.Q(timestamp=cursor_ts, id__gt=cursor_id)
+                )
+
+        if after is not None:
+            page = list(messages.order_by('timestamp', 'id')[:limit + 1])
+        else:
+            page = list(messages.order_by('-timestamp', '-id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if after is None:
+            page.reverse()
+        return page, has_more
+
 
 class Event(models.Model):
     EVENT_STATUSES = (
@@ -177,6 +247,13 @@ class Event(models.Model):
         ordering = ['event_date']
         verbose_name = "Event"
         verbose_name_plural = "Events"
+        indexes = [
+            # A club's upcoming events and calendar months
+            models.Index(fields=['club', 'event_date'], name='clubs_event_club_date_idx'),
+            # send_event_reminders: upcoming events whose reminder is still due
+            models.Index(fields=['status', 'reminder_time'], condition=models.Q(reminder_sent=False),
+                         name='clubs_event_reminder_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.club.name}"
@@ -252,6 +329,12 @@ class Membership(models.Model):
         unique_together = ('user', 'club')  # Prevent duplicate memberships
         verbose_name = "Membership"
         verbose_name_plural = "Memberships"
+        indexes = [
+            # Approved members and pending requests of a club
+            models.Index(fields=['club', 'status'], name='clubs_membership_club_st_idx'),
+            # A user's approved clubs
+            models.Index(fields=['user', 'status'], name='clubs_membership_user_st_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.club.name} ({self.status})"
@@ -293,11 +376,21 @@ class Message(models.Model):
         ordering = ['timestamp']  # Messages always ordered by timestamp
         verbose_name = "Message"
         verbose_name_plural = "Messages"
-
-    def save(self, *args, **kwargs):
-        """Validate and sanitize message before saving."""
+        indexes = [
+            # Keyset pagination of a club's chat history
+            models.Index(fields=['club', 'timestamp', 'id'], name='clubs_msg_club_ts_id_idx'),
+            # Unread counts: messages in a club above a read cursor
+            models.Index(fields=['club', 'id'], name='clubs_msg_club_id_idx'),
+        ]
+
+    def save(self, *args, validate_membership=True, **kwargs):
+        """
+        Validate and sanitize message before saving.
+        Callers that have already authorized the sender (e.g. the chat consumer, which
+        caches membership for the lifetime of the socket) may pass validate_membership=False.
+        """
         # Validation: Check if sender is a member of the club OR the club admin
-        if not self.club.is_user_member(self.sender):
+        if validate_membership and not self.club.is_user_member(self.sender):
             raise ValidationError(f"{self.sender.username} is not a member of the club.")
 
         # Escape the content to prevent XSS attacks
@@ -306,6 +399,75 @@ class Message(models.Model):
         # Save the message
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bulk_ingest(cls, messages, batch_size=1000, escape_content=True, ignore_conflicts=False):
+        """
+        Validate and insert many unsaved messages, returning (created, rejected).
+
+        Applies the same rules as save() without a query per row: each club's approved
+        members and admin are loaded once, messages from anyone else are rejected, content
+        is escaped in one pass and rows are inserted with bulk_create in batches of
+        `batch_size`. Pass escape_content=False for content that was escaped when first
+        saved (e.g. a restore). Timestamps already set on the messages are kept. With
+        ignore_conflicts, messages whose ids already exist are left out of `created`.
+        post_save is not sent, so no notifications are created.
+        """
+        messages = list(messages)
+        club_ids = {message.club_id for message in messages}
+        allowed = {club_id: set() for club_id in club_ids}
+        for club_id, admin_id in Club.objects.filter(id__in=club_ids).values_list('id', 'admin_id'):
+            allowed[club_id].add(admin_id)
+        for club_id, user_id in Membership.objects.filter(
+            club_id__in=club_ids, status='approved'
+        ).values_list('club_id', 'user_id'):
+            allowed[club_id].add(user_id)
+
+        created, rejected = [], []
+        for message in messages:
+            (created if message.sender_id in allowed[message.club_id] else rejected).append(message)
+        if ignore_conflicts:
+            # Drop messages whose ids already exist so they are neither reported nor touched
+            ids = [message.pk for message in created if message.pk is not None]
+            existing = set()
+            for start in range(0, len(ids), batch_size):
+                existing.update(cls.objects.filter(pk__in=ids[start:start + batch_size]).values_list('pk', flat=True))
+            created = [message for message in created if message.pk not in existing]
+        if escape_content:
+            for message in created:
+                message.content = escape(message.content)
+
+        # bulk_create applies auto_now_add, so explicit timestamps are written back afterwards
+        # by pk. Only preset ids can conflict, and bulk_create leaves pks unset when ignoring
+        # conflicts, so messages without an id are inserted without ignore_conflicts.
+        timestamps = [(message, message.timestamp) for message in created if message.timestamp is not None]
+        with transaction.atomic():
+            with_ids = [message for message in created if message.pk is not None]
+            without_ids = [message for message in created if message.pk is None]
+            cls.objects.bulk_create(with_ids, batch_size=batch_size, ignore_conflicts=ignore_conflicts)
+            cls.objects.bulk_create(without_ids, batch_size=batch_size)
+            for message, timestamp in timestamps:
+                message.timestamp = timestamp
+            cls.objects.bulk_update([message for message, _ in timestamps], ['timestamp'], batch_size=batch_size)
+        from .services.unread import forget_latest_messages
+        forget_latest_messages(club_ids)
+        return created, rejected
+
+    def to_chat_payload(self):
+        """Client-facing representation used by the chat history endpoint and WebSocket frames."""
+        avatar_url = None
+        try:
+            if self.sender.profile.profile_pic:
+                avatar_url = self.sender.profile.profile_pic.url
+        except (Profile.DoesNotExist, ValueError):
+            pass
+        return {
+            'id': self.id,
+            'message': self.content,
+            'username': self.sender.username,
+            'timestamp': self.timestamp.isoformat(),
+            'avatar_url': avatar_url,
+        }
+
     def delete(self):
         """Perform a soft delete by setting `is_deleted` to True."""
         self.is_deleted = True
@@ -315,22 +477,238 @@ class Message(models.Model):
         return f"Message from {self.sender.username} in {self.club.name}"
 
 
+# Notification kinds whose unread rows are merged into one row per (user, club, kind);
+# both Notification.upsert and the unread-kind constraint read this
+COALESCED_KINDS = ('document', 'event')
+
+
 class Notification(models.Model):
+    KIND_MEMBERSHIP_REQUEST = 'membership_request'
+    KIND_MEMBERSHIP_DECISION = 'membership_decision'
+    KIND_DOCUMENT = 'document'
+    KIND_EVENT = 'event'
+    KIND_EVENT_REMINDER = 'event_reminder'
+    KIND_CHOICES = (
+        ('', 'Other'),
+        (KIND_MEMBERSHIP_REQUEST, 'Membership requested'),
+        (KIND_MEMBERSHIP_DECISION, 'Membership approved or rejected'),
+        (KIND_DOCUMENT, 'Document shared'),
+        (KIND_EVENT, 'Event scheduled'),
+        (KIND_EVENT_REMINDER, 'Event reminder'),
+    )
+    # Where each kind links to: (url name, takes club_id, fragment)
+    KIND_URLS = {
+        KIND_MEMBERSHIP_REQUEST: ('admin_dashboard', False, ''),
+        KIND_MEMBERSHIP_DECISION: ('club_detail', True, ''),
+        KIND_DOCUMENT: ('messaging', True, '#documents'),
+        KIND_EVENT: ('event_list', True, ''),
+        KIND_EVENT_REMINDER: ('event_list', True, ''),
+    }
+    # Merged rows of COALESCED_KINDS read "<count> <summary> in <club>"
+    COALESCED_SUMMARIES = {
+        KIND_DOCUMENT: 'new documents',
+        KIND_EVENT: 'new events',
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     club = models.ForeignKey('Club', on_delete=models.CASCADE, related_name='notifications')
-    message = models.ForeignKey('Message', on_delete=models.CASCADE, related_name='notifications', null=True, blank=True)
     content = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Identifies the object a fan-out notification is about (e.g. "document:12"), so
+    # background fan-out tasks can be retried without notifying anyone twice
+    source_key = models.CharField(max_length=64, blank=True, default='')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, blank=True, default='')
+    # Id of the object the notification is about (membership, document or event, by kind)
+    target_id = models.BigIntegerField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    last_actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
 
     class Meta:
         ordering = ['-timestamp']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        indexes = [
+            # The dropdown: a user's newest notifications
+            models.Index(fields=['user', '-timestamp'], name='clubs_notif_user_ts_idx'),
+            # Unread counts, which only ever look at unread rows
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='clubs_notif_user_unread_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source_key'],
+                condition=~models.Q(source_key=''),
+                name='clubs_notification_user_source_uniq',
+            ),
+            # At most one unread row per coalesced kind
+            models.UniqueConstraint(
+                fields=['user', 'club', 'kind'],
+                condition=models.Q(is_read=False, kind__in=COALESCED_KINDS),
+                name='clubs_notification_unread_kind_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user} in {self.club}: {self.content}"
 
+    def get_absolute_url(self):
+        """Link for the notification, resolved from kind and club_id without queries."""
+        url_name, takes_club, fragment = self.KIND_URLS.get(self.kind, ('club_detail', True, ''))
+        kwargs = {'club_id': self.club_id} if takes_club else {}
+        return reverse(url_name, kwargs=kwargs) + fragment
+
+    @classmethod
+    def upsert(cls, user_ids, club, kind, source_key, content, actor=None, target_id=None):
+        """
+        Notify users about one source object and return the ids of users who got a new row.
+
+        For coalesced kinds, a user's existing unread row for the club and kind is updated
+        in place (count, summary text, last actor, timestamp) instead of adding a row.
+        Users already notified about `source_key` (per NotificationSource, since a merged
+        row only carries its newest source) are skipped, so retries are no-ops.
+        """
+        user_ids = list(user_ids)
+        applied = set(
+            NotificationSource.objects.filter(source_key=source_key, user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        pending = [user_id for user_id in user_ids if user_id not in applied]
+        NotificationSource.objects.bulk_create([
+            NotificationSource(user_id=user_id, source_key=source_key) for user_id in pending
+        ], ignore_conflicts=True)
+
+        def merge(merge_ids):
+            unread = cls.objects.filter(user_id__in=merge_ids, club=club, kind=kind, is_read=False)
+            merged = set(unread.values_list('user_id', flat=True))
+            summary = f" {cls.COALESCED_SUMMARIES.get(kind, 'new notifications')} in {club.name}"
+            if actor is not None:
+                summary += f", latest from {actor.username}"
+            unread.update(
+                count=models.F('count') + 1,
+                content=Concat(Cast(models.F('count') + 1, models.CharField()), models.Value(summary[:240])),
+                last_actor=actor,
+                source_key=source_key,
+                target_id=target_id,
+                timestamp=timezone.now(),
+            )
+            return merged
+
+        coalesced = kind in COALESCED_KINDS
+        merged = merge(pending) if coalesced else set()
+        new_ids = [user_id for user_id in pending if user_id not in merged]
+        cls.objects.bulk_create([
+            cls(user_id=user_id, club=club, content=content, source_key=source_key, kind=kind,
+                target_id=target_id, last_actor=actor)
+            for user_id in new_ids
+        ], ignore_conflicts=True)
+        if new_ids:
+            # A concurrent fan-out for another object of this kind may have inserted the
+            # unread row first, making ours conflict; those users are merged into it instead
+            inserted = set(
+                cls.objects.filter(source_key=source_key, user_id__in=new_ids).values_list('user_id', flat=True)
+            )
+            raced = [user_id for user_id in new_ids if user_id not in inserted]
+            if raced and coalesced:
+                merge(raced)
+            new_ids = [user_id for user_id in new_ids if user_id in inserted]
+        return new_ids
+
+
+class NotificationSource(models.Model):
+    """
+    A source object (Notification.source_key) a user has been notified about.
+
+    Coalesced notifications merge many sources into one row, so this ledger is what
+    makes fan-out retries idempotent per source. Rows older than the notification
+    retention period are pruned with them.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    source_key = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'source_key'], name='clubs_notif_source_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} notified about {self.source_key}"
+
+
+class ClubReadCursor(models.Model):
+    """
+    How far a user has read a club's chat.
+
+    Chat messages do not create Notification rows; unread counts are computed from
+    this cursor when they are displayed. Message ids only increase, so everything in
+    the club with an id above `last_read_id` is unread.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='club_read_cursors')
+    club = models.ForeignKey('Club', on_delete=models.CASCADE, related_name='read_cursors')
+    last_read_id = models.BigIntegerField(default=0, help_text="Id of the newest chat message the user has seen.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'club'], name='clubs_read_cursor_user_club_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read {self.club} up to message {self.last_read_id}"
+
+    @classmethod
+    def start(cls, user_id, club_id):
+        """Create a cursor at the club's newest message, so history from before joining is not unread."""
+        from .services.unread import forget_read_cursors
+        latest_id = Message.objects.filter(club_id=club_id).order_by('-id').values_list('id', flat=True).first()
+        cls.objects.get_or_create(user_id=user_id, club_id=club_id, defaults={'last_read_id': latest_id or 0})
+        forget_read_cursors(user_id)
+
+    @classmethod
+    def advance(cls, user_id, club_id, message_id):
+        """Move a user's cursor forward to message_id; it never moves back."""
+        from .services.unread import forget_read_cursors
+        if message_id is None:
+            return
+        updated = cls.objects.filter(
+            user_id=user_id, club_id=club_id, last_read_id__lt=message_id
+        ).update(last_read_id=message_id)
+        if not updated:
+            _, created = cls.objects.get_or_create(
+                user_id=user_id, club_id=club_id, defaults={'last_read_id': message_id}
+            )
+            if not created:
+                return  # Already at or past message_id
+        forget_read_cursors(user_id)
+
+    @classmethod
+    def mark_all_read(cls, user_id):
+        """Move all of a user's cursors to the newest message in each club."""
+        from .services.unread import forget_read_cursors
+        latest = Message.objects.filter(club_id=models.OuterRef('club_id')).order_by('-id').values('id')[:1]
+        cls.objects.filter(user_id=user_id).update(
+            last_read_id=Coalesce(models.Subquery(latest), models.F('last_read_id'))
+        )
+        forget_read_cursors(user_id)
+
+    @classmethod
+    def unread_summary(cls, user):
+        """
+        Clubs with unread chat for a user, newest activity first, as dicts with
+        club_id, club__name, unread and latest. Messages the user sent are not counted.
+        """
+        return list(
+            Message.objects.filter(
+                club__read_cursors__user=user,
+                id__gt=models.F('club__read_cursors__last_read_id'),
+            )
+            .exclude(sender=user)
+            .values('club_id', 'club__name')
+            .annotate(unread=models.Count('id'), latest=models.Max('timestamp'))
+            .order_by('-latest')
+        )
+
 
 class Document(models.Model):
     club = models.ForeignKey(
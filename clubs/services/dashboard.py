@@ -0,0 +1,52 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from ..models import Club
+
+logger = logging.getLogger(__name__)
+
+
+def membership_stats_key(admin_id):
+    return f"admin_stats:{admin_id}"
+
+
+def clubs_with_member_counts(admin_id):
+    """
+    The admin's clubs annotated with approved_count and pending_count in one query.
+    approved_count counts the admin once, as Club.get_all_members does.
+    """
+    return Club.objects.filter(admin_id=admin_id).annotate(
+        approved_members=Count(
+            'memberships', filter=Q(memberships__status='approved') & ~Q(memberships__user_id=F('admin_id'))
+        ),
+        pending_count=Count('memberships', filter=Q(memberships__status='pending')),
+    ).annotate(approved_count=F('approved_members') + 1).order_by('name', 'id')
+
+
+def membership_stats(admin_id):
+    """Chart series for the admin dashboard, cached until a membership of one of the clubs changes."""
+    try:
+        stats = cache.get(membership_stats_key(admin_id))
+    except Exception as e:
+        logger.error(f"Could not read membership stats for admin {admin_id}: {str(e)}")
+        stats = None
+    if stats is None:
+        rows = list(clubs_with_member_counts(admin_id).values_list('name', 'approved_count', 'pending_count'))
+        stats = {
+            'club_names': [name for name, _, _ in rows],
+            'approved_counts': [approved for _, approved, _ in rows],
+            'pending_counts': [pending for _, _, pending in rows],
+        }
+        try:
+            cache.set(membership_stats_key(admin_id), stats, settings.ADMIN_STATS_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Could not cache membership stats for admin {admin_id}: {str(e)}")
+    return stats
+
+
+def forget_membership_stats(admin_id):
+    try:
+        cache.delete(membership_stats_key(admin_id))
+    except Exception as e:
+        logger.error(f"Could not clear membership stats for admin {admin_id}: {str(e)}")
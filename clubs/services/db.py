@@ -0,0 +1,57 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def db_workers():
+    """Threads chat consumers may use for database work; 0 means asgiref's single thread-sensitive thread."""
+    return getattr(settings, 'CHAT_DB_WORKERS', 0)
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-db')
+            _executor_workers = workers
+        return _executor
+
+
+def _with_fresh_connection(func):
+    # Worker threads keep their own connections between calls, so drop any that are
+    # broken or past CONN_MAX_AGE, as Django does around every request
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return inner
+
+
+def database_sync_to_async(func):
+    """
+    Run a synchronous ORM function from async code on a bounded pool of CHAT_DB_WORKERS threads.
+
+    Plain sync_to_async (and Django's async ORM methods, which wrap it) sends every call
+    in the process through one thread, so all chat rooms queue behind each other's queries.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        workers = db_workers()
+        if workers <= 0:
+            return await sync_to_async(func)(*args, **kwargs)
+        return await sync_to_async(
+            _with_fresh_connection(func), thread_sensitive=False, executor=_get_executor(workers)
+        )(*args, **kwargs)
+    return wrapper
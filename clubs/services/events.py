@@ -0,0 +1,67 @@
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def events_changed_key(club_id):
+    return f"club_events_changed:{club_id}"
+
+
+def events_changed_ns(club_id):
+    """
+    When the club's events last changed, in nanoseconds. A miss starts from now, so
+    conditional requests made before an eviction are answered in full once.
+    """
+    try:
+        changed = cache.get(events_changed_key(club_id))
+        if changed is None:
+            changed = time.time_ns()
+            cache.set(events_changed_key(club_id), changed, settings.EVENT_CALENDAR_CACHE_TIMEOUT)
+        return changed
+    except Exception as e:
+        logger.error(f"Could not read events change time for club {club_id}: {str(e)}")
+        return time.time_ns()
+
+
+def touch_club_events(club_id):
+    """Record that an event of the club was created, changed or deleted."""
+    try:
+        cache.set(events_changed_key(club_id), time.time_ns(), settings.EVENT_CALENDAR_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Could not record events change for club {club_id}: {str(e)}")
+
+
+def events_last_modified(club_id):
+    return datetime.fromtimestamp(events_changed_ns(club_id) / 1e9, tz=dt_timezone.utc)
+
+
+def parse_month(value):
+    """
+    (year, month) from 'YYYY-MM', or None when it is missing, malformed or so far out
+    that the month's window or its neighbours' links would leave datetime's range.
+    """
+    try:
+        year, month = (int(part) for part in value.split('-'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not (2 <= year <= 9998 and 1 <= month <= 12):
+        return None
+    return year, month
+
+
+def month_window(year, month):
+    """The aware [start, end) bounds of a calendar month in the current time zone."""
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return start, end
+
+
+def adjacent_months(year, month):
+    previous = (year - 1, 12) if month == 1 else (year, month - 1)
+    following = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{previous[0]:04d}-{previous[1]:02d}", f"{following[0]:04d}-{following[1]:02d}"
@@ -0,0 +1,64 @@
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Club, Membership
+
+logger = logging.getLogger(__name__)
+
+
+def club_ids_version_key(user_id):
+    return f"user_clubs_version:{user_id}"
+
+
+def club_ids_key(user_id, version):
+    return f"user_clubs:{user_id}:{version}"
+
+
+def _version(user_id):
+    try:
+        version = cache.get(club_ids_version_key(user_id))
+        if version is None:
+            # A fresh version is unique, so a set cached before an eviction is never reused
+            version = time.time_ns()
+            cache.set(club_ids_version_key(user_id), version, settings.USER_CLUBS_CACHE_TIMEOUT)
+        return version
+    except Exception as e:
+        logger.error(f"Could not read club set version for user {user_id}: {str(e)}")
+        return None
+
+
+def user_club_ids(user_id):
+    """Ids of the clubs a user administers or is an approved member of, cached per user."""
+    version = _version(user_id)
+    club_ids = None
+    if version is not None:
+        try:
+            club_ids = cache.get(club_ids_key(user_id, version))
+        except Exception as e:
+            logger.error(f"Could not read club set for user {user_id}: {str(e)}")
+    if club_ids is None:
+        club_ids = frozenset(
+            Membership.objects.filter(user_id=user_id, status='approved').values_list('club_id', flat=True)
+        ) | frozenset(Club.objects.filter(admin_id=user_id).values_list('id', flat=True))
+        if version is not None:
+            try:
+                cache.set(club_ids_key(user_id, version), club_ids, settings.USER_CLUBS_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Could not cache club set for user {user_id}: {str(e)}")
+    return club_ids
+
+
+def bump_user_clubs(user_ids):
+    """
+    Move users to a new club set version. A reader that loaded the old set and caches it
+    late writes under the old version, which is never read again.
+    """
+    for user_id in user_ids:
+        try:
+            cache.incr(club_ids_version_key(user_id))
+        except ValueError:
+            pass  # Not cached; the next read starts a new version
+        except Exception as e:
+            logger.error(f"Could not bump club set version for user {user_id}: {str(e)}")
+            return
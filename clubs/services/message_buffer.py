@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils.html import escape
+from ..models import Message
+from .db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+def write_behind_window():
+    """Seconds to buffer chat messages per room before persisting; 0 disables buffering."""
+    return getattr(settings, 'CHAT_WRITE_BEHIND_WINDOW', 0)
+
+
+class RoomMessageBuffer:
+    """
+    Write-behind buffer for a single chat room.
+
+    Messages are collected for a short window and persisted with one bulk_create,
+    then broadcast in arrival order with their real ids and timestamps. Every message
+    is either broadcast (which acks its temp_id) or answered with an error frame.
+    """
+    _rooms = {}
+
+    def __init__(self, room_group_name):
+        self.room_group_name = room_group_name
+        self.pending = []
+        self._flusher = None
+
+    @classmethod
+    def for_room(cls, room_group_name):
+        buffer = cls._rooms.get(room_group_name)
+        if buffer is None:
+            buffer = cls._rooms[room_group_name] = cls(room_group_name)
+        return buffer
+
+    async def add(self, consumer, content, temp_id):
+        """Queue a message from an already-authorized consumer."""
+        message = Message(club=consumer.club, sender=consumer.user, content=escape(content))
+        self.pending.append((consumer, message, temp_id))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        await asyncio.sleep(write_behind_window())
+        max_batch = getattr(settings, 'CHAT_WRITE_BEHIND_MAX_BATCH', 100)
+        # Batches are flushed one after another so room ordering is preserved
+        while self.pending:
+            batch, self.pending = self.pending[:max_batch], self.pending[max_batch:]
+            await self._flush(batch)
+        self._rooms.pop(self.room_group_name, None)
+
+    async def _flush(self, batch):
+        try:
+            await self._persist([message for _, message, _ in batch])
+        except Exception as e:
+            logger.error(f"Error bulk saving {len(batch)} messages for '{self.room_group_name}': {str(e)}")
+            for consumer, _, temp_id in batch:
+                await consumer.send_error(f"Could not save message: Database error: {str(e)}", temp_id)
+            return
+
+        # A failed broadcast must not keep the rest of the batch (or later batches) from going out
+        for consumer, message, temp_id in batch:
+            try:
+                await consumer.broadcast_message(message, temp_id)
+            except Exception as e:
+                logger.error(f"Error broadcasting message {message.id} to '{self.room_group_name}': {str(e)}")
+                await consumer.send_error(f"Message saved but could not be delivered: {str(e)}", temp_id)
+
+    @staticmethod
+    @database_sync_to_async
+    def _persist(messages):
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            # bulk_create skips post_save; send it so receivers still see every message
+            for message in messages:
+                post_save.send(
+                    sender=Message, instance=message, created=True,
+                    update_fields=None, raw=False, using=message._state.db
+                )
@@ -0,0 +1,146 @@
+import json
+import logging
+import math
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'clubs.keyset'
+
+
+def approximate_count(queryset, cache_key):
+    """
+    Row count for page totals without a COUNT(*) per request.
+
+    On PostgreSQL, large results use the planner's row estimate (from pg_class statistics);
+    otherwise, and for small results where estimates are poor, an exact count is cached
+    for PAGINATION_COUNT_CACHE_TIMEOUT seconds.
+    """
+    if connection.vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.explain(format='json'))
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+                return estimate
+        except Exception as e:
+            logger.error(f"Could not estimate row count for '{cache_key}': {str(e)}")
+
+    try:
+        count = cache.get(cache_key)
+    except Exception as e:
+        logger.error(f"Could not read cached count '{cache_key}': {str(e)}")
+        count = None
+    if count is None:
+        count = queryset.count()
+        try:
+            cache.set(cache_key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Could not cache count '{cache_key}': {str(e)}")
+    return count
+
+
+def _seek(ordering, values, lookup):
+    # (a, b) > (x, y) as a filter: a > x, or a = x and b > y (likewise for "lt")
+    condition = Q(**{f"{ordering[-1]}__{lookup}": values[-1]})
+    for field, value in zip(reversed(ordering[:-1]), reversed(values[:-1])):
+        condition = Q(**{f"{field}__{lookup}": value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, paginator, object_list, number, has_previous, has_next):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def _cursor(self, direction, obj, number):
+        values = [getattr(obj, field) for field in self.paginator.ordering]
+        return signing.dumps({direction: values, 'n': number}, salt=CURSOR_SALT, compress=True)
+
+    @property
+    def next_cursor(self):
+        return self._cursor('a', self.object_list[-1], self.number + 1) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor('b', self.object_list[0], self.number - 1) if self._has_previous else None
+
+
+class KeysetPaginator:
+    """
+    Seek pagination: each page is fetched with a WHERE on the last row of the page before
+    (ordered by the unique `ordering` fields, ascending), so neither deep pages nor page
+    links need an OFFSET or a COUNT(*). Page totals come from `count`, a callable that may
+    return a cached or estimated figure, and are only evaluated when a template asks.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('name', 'id'), count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self._count = count or queryset.count
+        self._cached_count = None
+
+    @property
+    def count(self):
+        if self._cached_count is None:
+            self._cached_count = self._count()
+        return self._cached_count
+
+    @property
+    def num_pages(self):
+        """Approximate when `count` is."""
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        direction = 'a' if 'a' in data else 'b'
+        values = data.get(direction)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        return direction, values, max(1, int(data.get('n', 1)))
+
+    def get_page(self, cursor=None):
+        """The page after or before the row encoded in `cursor`; the first page when it is missing or invalid."""
+        decoded = self._decode(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            return KeysetPage(self, rows[:self.per_page], 1, False, len(rows) > self.per_page)
+
+        direction, values, number = decoded
+        if direction == 'a':
+            rows = list(
+                self.queryset.filter(_seek(self.ordering, values, 'gt')).order_by(*self.ordering)[:self.per_page + 1]
+            )
+            return KeysetPage(self, rows[:self.per_page], number, True, len(rows) > self.per_page)
+
+        descending = [f"-{field}" for field in self.ordering]
+        rows = list(self.queryset.filter(_seek(self.ordering, values, 'lt')).order_by(*descending)[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        # Rows may have been added or removed since the cursor was made; the first page is always page 1
+        return KeysetPage(self, rows, number if has_previous else 1, has_previous, True)
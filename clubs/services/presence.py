@@ -0,0 +1,175 @@
+import time
+from django.conf import settings
+
+
+def room_group_for_club(club_id):
+    """Chat room group name used by ChatConsumer for a club."""
+    return f"chat_club_{club_id}"
+
+
+def _owners(live_entries):
+    """Map user id -> username for a collection of (user_id, username) entries."""
+    return {user_id: username for user_id, username in live_entries}
+
+
+class MemoryPresenceRegistry:
+    """
+    In-process presence registry, used when the channel layer is not Redis (tests, local dev).
+
+    Every open socket is an entry keyed by channel name, so a user with several tabs
+    stays online until the last one leaves or stops sending heartbeats.
+    """
+
+    def __init__(self):
+        self._rooms = {}  # room -> {channel_name: (user_id, username, expires_at)}
+
+    def _live(self, room, now):
+        return {
+            channel: (user_id, username)
+            for channel, (user_id, username, expires_at) in self._rooms.get(room, {}).items()
+            if expires_at > now
+        }
+
+    async def join(self, room, channel_name, user_id, username):
+        """Register a socket; return True if the user was not online in the room before."""
+        now = time.time()
+        already_online = user_id in _owners(self._live(room, now).values())
+        self._rooms.setdefault(room, {})[channel_name] = (user_id, username, now + settings.CHAT_PRESENCE_TTL)
+        return not already_online
+
+    async def heartbeat(self, room, channel_name):
+        entry = self._rooms.get(room, {}).get(channel_name)
+        if entry is not None:
+            user_id, username, _ = entry
+            self._rooms[room][channel_name] = (user_id, username, time.time() + settings.CHAT_PRESENCE_TTL)
+
+    async def leave(self, room, channel_name):
+        """Drop a socket; return the username if that was the user's last socket in the room."""
+        entry = self._rooms.get(room, {}).pop(channel_name, None)
+        if entry is None:
+            return None
+        user_id, username, _ = entry
+        if user_id in _owners(self._live(room, time.time()).values()):
+            return None
+        return username
+
+    async def sweep(self, room):
+        """Remove expired sockets; return usernames that no longer have any live socket."""
+        now = time.time()
+        entries = self._rooms.get(room, {})
+        expired = {channel: entries.pop(channel) for channel, (_, _, expires_at) in list(entries.items())
+                   if expires_at <= now}
+        live_owners = _owners(self._live(room, now).values())
+        gone = {user_id: username for user_id, username, _ in expired.values() if user_id not in live_owners}
+        return sorted(gone.values())
+
+    async def online(self, room):
+        return sorted(set(_owners(self._live(room, time.time()).values()).values()))
+
+
+class RedisPresenceRegistry:
+    """
+    Presence registry stored in the channel layer's Redis.
+
+    Per room, a sorted set holds channel names scored by their expiry time and a hash
+    maps each channel name to "user_id:username". Reads only consider unexpired entries;
+    sweep() deletes the expired ones.
+    """
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+
+    def _keys(self, room):
+        base = f"{self.channel_layer.prefix}:presence:{room}"
+        return base, f"{base}:owners"
+
+    def _connection(self, room):
+        return self.channel_layer.connection(self.channel_layer.consistent_hash(room))
+
+    @staticmethod
+    def _decode(owner):
+        user_id, username = owner.decode().split(':', 1)
+        return int(user_id), username
+
+    async def _live(self, connection, room, now):
+        expiries, owners = self._keys(room)
+        channels = await connection.zrangebyscore(expiries, now, '+inf')
+        if not channels:
+            return {}
+        values = await connection.hmget(owners, channels)
+        return {channel: self._decode(owner) for channel, owner in zip(channels, values) if owner}
+
+    async def join(self, room, channel_name, user_id, username):
+        connection = self._connection(room)
+        expiries, owners = self._keys(room)
+        now = time.time()
+        already_online = user_id in _owners((await self._live(connection, room, now)).values())
+        ttl = settings.CHAT_PRESENCE_TTL
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zadd(expiries, {channel_name: now + ttl})
+            pipe.hset(owners, channel_name, f"{user_id}:{username}")
+            # Idle rooms clean themselves up even if no socket ever sweeps them
+            pipe.expire(expiries, ttl * 2)
+            pipe.expire(owners, ttl * 2)
+            await pipe.execute()
+        return not already_online
+
+    async def heartbeat(self, room, channel_name):
+        connection = self._connection(room)
+        expiries, owners = self._keys(room)
+        ttl = settings.CHAT_PRESENCE_TTL
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zadd(expiries, {channel_name: time.time() + ttl}, xx=True)
+            pipe.expire(expiries, ttl * 2)
+            pipe.expire(owners, ttl * 2)
+            await pipe.execute()
+
+    async def leave(self, room, channel_name):
+        connection = self._connection(room)
+        expiries, owners = self._keys(room)
+        owner = await connection.hget(owners, channel_name)
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zrem(expiries, channel_name)
+            pipe.hdel(owners, channel_name)
+            await pipe.execute()
+        if not owner:
+            return None
+        user_id, username = self._decode(owner)
+        if user_id in _owners((await self._live(connection, room, time.time())).values()):
+            return None
+        return username
+
+    async def sweep(self, room):
+        connection = self._connection(room)
+        expiries, owners = self._keys(room)
+        now = time.time()
+        expired = await connection.zrangebyscore(expiries, '-inf', now)
+        if not expired:
+            return []
+        values = await connection.hmget(owners, expired)
+        async with connection.pipeline(transaction=True) as pipe:
+            pipe.zrem(expiries, *expired)
+            pipe.hdel(owners, *expired)
+            await pipe.execute()
+        live_owners = _owners((await self._live(connection, room, now)).values())
+        gone = {}
+        for owner in values:
+            if owner:
+                user_id, username = self._decode(owner)
+                if user_id not in live_owners:
+                    gone[user_id] = username
+        return sorted(gone.values())
+
+    async def online(self, room):
+        connection = self._connection(room)
+        return sorted(set(_owners((await self._live(connection, room, time.time())).values()).values()))
+
+
+_memory_registry = MemoryPresenceRegistry()
+
+
+def get_presence_registry(channel_layer):
+    """Use the channel layer's Redis when it has one, otherwise the in-memory registry."""
+    if hasattr(channel_layer, 'connection') and hasattr(channel_layer, 'consistent_hash'):
+        return RedisPresenceRegistry(channel_layer)
+    return _memory_registry
@@ -0,0 +1,156 @@
+import json
+import logging
+import threading
+from collections import Counter
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+
+def chat_user_group(user_id):
+    """Group joined by every chat socket a user has open, across all rooms."""
+    return f"chat_user_{user_id}"
+
+
+def notification_user_group(user_id):
+    """Group joined by every notification socket a user has open (one per browser tab)."""
+    return f"notifications_{user_id}"
+
+
+def club_activity_group(club_id):
+    """Group of notification sockets whose users read the club's chat."""
+    return f"club_activity_{club_id}"
+
+
+def send_to_group(group_name, event):
+    """
+    Send an event to a channel-layer group from synchronous code (signals, views, tasks).
+    Failures are logged rather than raised so a Redis outage never breaks a request.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group_name, event)
+    except Exception as e:
+        logger.error(f"Could not send '{event.get('type')}' to group '{group_name}': {str(e)}")
+
+
+def revoke_chat_membership(user_id, club_id):
+    """Tell any open chat sockets of this user that they may no longer post in the club."""
+    send_to_group(chat_user_group(user_id), {
+        'type': 'membership_revoked',
+        'club_id': club_id,
+    })
+
+
+def push_notifications(notifications, new_user_ids=None):
+    """
+    Push created or merged notifications to their recipients' notification sockets.
+    Recipients in `new_user_ids` (all of them when None) got a new unread row, so their
+    badge goes up by one; for the others an existing unread row was updated in place.
+    """
+    for notification in notifications:
+        is_new = new_user_ids is None or notification.user_id in new_user_ids
+        send_to_group(notification_user_group(notification.user_id), {
+            'type': 'notification_push',
+            'text': json.dumps({
+                'type': 'notification',
+                'notification': {
+                    'id': notification.id,
+                    'content': notification.content,
+                    'url': notification.get_absolute_url(),
+                    'timestamp': notification.timestamp.isoformat() if notification.timestamp else None,
+                    'count': notification.count,
+                },
+                'unread_delta': 1 if is_new else 0,
+            }),
+        })
+
+
+def push_notifications_read(user_id):
+    """Clear the badge in every tab once the user has marked everything read."""
+    send_to_group(notification_user_group(user_id), {
+        'type': 'notification_push',
+        'text': json.dumps({'type': 'notifications_read'}),
+    })
+
+
+class ChatActivityThrottle:
+    """
+    Coalesces chat activity pushes per club, as typing and presence snapshots are.
+
+    The first message in a quiet club is pushed at once. Messages arriving within the
+    next CHAT_ACTIVITY_TICK are folded into one push when the tick ends, carrying the
+    latest message id and how many messages each sender posted, so members' sockets get
+    at most one frame per club per tick. State is per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clubs = {}  # club_id -> pending activity, or None while a quiet tick runs
+
+    def record(self, club_id, club_name, message_id, sender_id):
+        tick = getattr(settings, 'CHAT_ACTIVITY_TICK', 0)
+        with self._lock:
+            if tick and club_id in self._clubs:
+                pending = self._clubs[club_id] or {'senders': Counter()}
+                pending.update(club_name=club_name, message_id=message_id)
+                pending['senders'][sender_id] += 1
+                self._clubs[club_id] = pending
+                return
+            if tick:
+                self._clubs[club_id] = None
+                self._start_timer(club_id, tick)
+        self._send(club_id, club_name, message_id, Counter({sender_id: 1}))
+
+    def _start_timer(self, club_id, tick):
+        timer = threading.Timer(tick, self._flush, args=(club_id, tick))
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self, club_id, tick):
+        with self._lock:
+            pending = self._clubs.get(club_id)
+            if pending is None:
+                self._clubs.pop(club_id, None)  # Quiet for a whole tick
+                return
+            self._clubs[club_id] = None
+            self._start_timer(club_id, tick)
+        self._send(club_id, pending['club_name'], pending['message_id'], pending['senders'])
+
+    @staticmethod
+    def _send(club_id, club_name, message_id, senders):
+        send_to_group(club_activity_group(club_id), {
+            'type': 'club_activity',
+            # Receivers subtract their own messages, and skip the frame when all were theirs
+            'senders': {str(sender_id): count for sender_id, count in senders.items()},
+            'text': json.dumps({
+                'type': 'chat_activity',
+                'club_id': club_id,
+                'club_name': club_name,
+                'message_id': message_id,
+                'new_messages': sum(senders.values()),
+                'url': reverse('messaging', kwargs={'club_id': club_id}),
+            }),
+        })
+
+
+chat_activity_throttle = ChatActivityThrottle()
+
+
+def push_chat_activity(message, club_name):
+    """Tell members' notification sockets that the club's chat has new messages, throttled per club."""
+    chat_activity_throttle.record(message.club_id, club_name, message.id, message.sender_id)
+
+
+def set_club_activity_subscription(user_id, club_id, subscribed):
+    """Add or remove a club's chat activity on the user's open notification sockets."""
+    send_to_group(notification_user_group(user_id), {
+        'type': 'activity_subscription',
+        'club_id': club_id,
+        'subscribed': subscribed,
+    })
@@ -0,0 +1,120 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+from ..models import Club
+
+# Words beyond this are ignored; they rarely narrow the results and each one costs a lookup
+MAX_TERMS = 8
+
+# Name matches an autocomplete lookup ranks before returning its best few
+AUTOCOMPLETE_CANDIDATES = 200
+
+
+class RankedClubs:
+    """Clubs in a precomputed rank order, fetched only for the slice asked for (e.g. by Paginator)."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0] if index >= 0 else self[len(self.ids) + index]
+        ids = self.ids[index]
+        clubs = Club.objects.in_bulk(ids)
+        return [clubs[club_id] for club_id in ids if club_id in clubs]
+
+
+def _terms(query):
+    # Word characters only, so the terms are safe inside tsquery and FTS5 syntax
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _tsquery(terms, names_only=False):
+    # ":*A" restricts a prefix match to the name, which carries weight A
+    weight = 'A' if names_only else ''
+    return SearchQuery(' & '.join(f"{term}:*{weight}" for term in terms), config='english', search_type='raw')
+
+
+def _fts_match(terms, names_only=False):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return f"name : ({match})" if names_only else match
+
+
+def search_clubs(query, names_only=False):
+    """
+    Clubs matching every word of `query` as a prefix, best match first.
+
+    PostgreSQL ranks the trigger-maintained `search_vector` (name weighted above
+    description) through its GIN index; SQLite ranks the clubs_club_fts FTS5 table
+    with bm25. Other databases fall back to unranked `icontains` matching.
+    Returns a queryset, or on SQLite a RankedClubs sequence; Paginator accepts both.
+    """
+    terms = _terms(query)
+    if not terms:
+        return Club.objects.none()
+
+    if connection.vendor == 'postgresql':
+        search = _tsquery(terms, names_only)
+        return (
+            Club.objects.filter(search_vector=search)
+            .annotate(rank=SearchRank(F('search_vector'), search))
+            .order_by('-rank', 'name')
+        )
+
+    if connection.vendor == 'sqlite':
+        # bm25 is only defined inside a MATCH query, so rank every match in one FTS5 query
+        # (lower is better, a name hit counts ten times a description hit) and load clubs per page
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid FROM clubs_club_fts WHERE clubs_club_fts MATCH %s "
+                "ORDER BY bm25(clubs_club_fts, 10.0, 1.0)",
+                [_fts_match(terms, names_only)],
+            )
+            return RankedClubs([row[0] for row in cursor.fetchall()])
+
+    matches = Q()
+    for term in terms:
+        term_match = Q(name__icontains=term)
+        if not names_only:
+            term_match |= Q(description__icontains=term)
+        matches &= term_match
+    return Club.objects.filter(matches).order_by('name')
+
+
+def autocomplete_clubs(prefix, limit=8):
+    """
+    Up to `limit` clubs whose name has words starting with those in `prefix`, as (id, name) pairs.
+
+    Short prefixes match thousands of names, so only the first AUTOCOMPLETE_CANDIDATES
+    matches found by the index are ranked, which keeps every lookup bounded.
+    """
+    terms = _terms(prefix)
+    if not terms:
+        return []
+
+    if connection.vendor == 'postgresql':
+        search = _tsquery(terms, names_only=True)
+        candidates = Club.objects.filter(search_vector=search).values('id')[:AUTOCOMPLETE_CANDIDATES]
+        return list(
+            Club.objects.filter(id__in=candidates)
+            .annotate(rank=SearchRank(F('search_vector'), search))
+            .order_by('-rank', 'name').values_list('id', 'name')[:limit]
+        )
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid, name FROM (SELECT rowid, name, bm25(clubs_club_fts) AS score FROM clubs_club_fts "
+                "WHERE clubs_club_fts MATCH %s LIMIT %s) ORDER BY score LIMIT %s",
+                [_fts_match(terms, names_only=True), AUTOCOMPLETE_CANDIDATES, limit],
+            )
+            return cursor.fetchall()
+
+    return list(search_clubs(prefix, names_only=True).values_list('id', 'name')[:limit])
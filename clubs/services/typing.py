@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RoomTypingAggregator:
+    """
+    Coalesces typing indicators for one chat room.
+
+    Typing frames only update in-memory state, keyed by socket so one user's tabs are
+    tracked separately. A ticker publishes at most one "who is typing" snapshot per
+    room per CHAT_TYPING_TICK, when the set of typing usernames changed, and re-sends
+    it every half CHAT_TYPING_TTL while anyone is typing. Typers that stop refreshing
+    expire after CHAT_TYPING_TTL.
+
+    State is per process, so each snapshot carries this process's `origin` and
+    clients merge snapshots from different origins. Clients drop a snapshot after its
+    `ttl`, so a process that dies mid-typing does not leave a stale indicator.
+    """
+    _rooms = {}
+    origin = uuid.uuid4().hex[:12]
+
+    def __init__(self, room_group_name, channel_layer):
+        self.room_group_name = room_group_name
+        self.channel_layer = channel_layer
+        self.typers = {}  # channel_name -> (username, expiry in monotonic seconds)
+        self.dirty = False
+        self.published_at = 0
+        self._ticker = None
+
+    @classmethod
+    def for_room(cls, room_group_name, channel_layer):
+        aggregator = cls._rooms.get(room_group_name)
+        if aggregator is None:
+            aggregator = cls._rooms[room_group_name] = cls(room_group_name, channel_layer)
+        return aggregator
+
+    @classmethod
+    def stop_typing(cls, room_group_name, channel_name):
+        """Clear a socket's typing state without creating an aggregator for an idle room."""
+        aggregator = cls._rooms.get(room_group_name)
+        if aggregator is not None:
+            aggregator.set_typing(channel_name, None, False)
+
+    def usernames(self):
+        return sorted({username for username, _ in self.typers.values()})
+
+    def set_typing(self, channel_name, username, typing):
+        before = self.usernames()
+        if typing:
+            self.typers[channel_name] = (username, time.monotonic() + settings.CHAT_TYPING_TTL)
+        else:
+            self.typers.pop(channel_name, None)
+        if self.usernames() != before:
+            self.dirty = True
+
+        if self.dirty and (self._ticker is None or self._ticker.done()):
+            self._ticker = asyncio.ensure_future(self._run())
+        elif not self.typers and self._ticker is None:
+            self._rooms.pop(self.room_group_name, None)
+
+    def _expire(self):
+        before = self.usernames()
+        now = time.monotonic()
+        for channel_name in [name for name, (_, expires_at) in self.typers.items() if expires_at <= now]:
+            del self.typers[channel_name]
+        if self.usernames() != before:
+            self.dirty = True
+
+    async def _run(self):
+        while self.typers or self.dirty:
+            await asyncio.sleep(settings.CHAT_TYPING_TICK)
+            self._expire()
+            # Unchanged snapshots are re-sent while anyone types, before clients' copies expire
+            due = self.typers and time.monotonic() - self.published_at >= settings.CHAT_TYPING_TTL / 2
+            if not (self.dirty or due):
+                continue
+            self.dirty = False
+            self.published_at = time.monotonic()
+            try:
+                # Encoded once here and forwarded as-is by every consumer in the room
+                await self.channel_layer.group_send(self.room_group_name, {
+                    'type': 'typing_snapshot',
+                    'text': json.dumps({
+                        'type': 'typing',
+                        'origin': self.origin,
+                        'users': self.usernames(),
+                        'ttl': settings.CHAT_TYPING_TTL,
+                    }),
+                })
+            except Exception as e:
+                logger.error(f"Could not publish typing snapshot for '{self.room_group_name}': {str(e)}")
+        self._rooms.pop(self.room_group_name, None)
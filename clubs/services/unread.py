@@ -0,0 +1,200 @@
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db.models import Max
+from ..models import ClubReadCursor, Message, Notification
+
+logger = logging.getLogger(__name__)
+
+
+def notification_count_key(user_id):
+    return f"notif_unread:{user_id}"
+
+
+def latest_message_key(club_id):
+    return f"chat_latest:{club_id}"
+
+
+def read_cursors_key(user_id):
+    return f"chat_cursors:{user_id}"
+
+
+def chat_summary_key(user_id):
+    return f"chat_unread:{user_id}"
+
+
+def notification_version_key(user_id):
+    return f"notif_version:{user_id}"
+
+
+def notification_dropdown_key(user_id, version):
+    return f"notif_dropdown:{user_id}:{version}"
+
+
+def _cache_call(method, *args):
+    # The cache only saves queries; when it is unavailable, callers fall back to the database
+    try:
+        return getattr(cache, method)(*args)
+    except Exception as e:
+        logger.error(f"Unread cache '{method}' failed: {str(e)}")
+        return None
+
+
+def unread_notification_count(user_id):
+    """Unread Notification rows for a user, from the counter when it is warm."""
+    count = _cache_call('get', notification_count_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        _cache_call('set', notification_count_key(user_id), count, settings.UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def increment_unread(user_ids, delta=1):
+    """Bump warm counters after notifications are created; cold counters are recomputed on read."""
+    for user_id in user_ids:
+        try:
+            cache.incr(notification_count_key(user_id), delta)
+        except ValueError:
+            pass  # Not cached
+        except Exception as e:
+            logger.error(f"Could not increment unread counter for user {user_id}: {str(e)}")
+            return
+
+
+def reset_unread(user_id):
+    _cache_call('set', notification_count_key(user_id), 0, settings.UNREAD_CACHE_TIMEOUT)
+
+
+def set_unread_counts(counts):
+    """Overwrite counters with recomputed values, as {user_id: count}."""
+    _cache_call('set_many', {notification_count_key(user_id): count for user_id, count in counts.items()},
+                settings.UNREAD_CACHE_TIMEOUT)
+
+
+def forget_unread(user_ids):
+    _cache_call('delete_many', [notification_count_key(user_id) for user_id in user_ids])
+
+
+def notification_version(user_id):
+    """Version of the user's notification list; a fresh one is unique, so evictions never revive stale fragments."""
+    version = _cache_call('get', notification_version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        _cache_call('set', notification_version_key(user_id), version, settings.UNREAD_CACHE_TIMEOUT)
+    return version
+
+
+def bump_notification_version(user_ids):
+    """Invalidate cached dropdown fragments after notifications are created, merged, read or deleted."""
+    for user_id in user_ids:
+        try:
+            cache.incr(notification_version_key(user_id))
+        except ValueError:
+            pass  # Not cached; the next read starts a new version
+        except Exception as e:
+            logger.error(f"Could not bump notification version for user {user_id}: {str(e)}")
+            return
+
+
+def cached_notification_dropdown(user_id, render):
+    """The rendered notification dropdown for the current version, calling `render()` on a miss."""
+    key = notification_dropdown_key(user_id, notification_version(user_id))
+    html = _cache_call('get', key)
+    if html is None:
+        html = render()
+        _cache_call('set', key, html, settings.NOTIFICATION_DROPDOWN_CACHE_TIMEOUT)
+    return html
+
+
+# Raise a cached integer to ARGV[1] unless it already holds a larger one. Django's Redis
+# backend stores integers unpickled, so the script can compare them directly.
+RAISE_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+if current == nil or current < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+"""
+
+
+def _raise_latest(latest):
+    """
+    Store {club_id: message_id} without ever lowering a cached id. On-commit callbacks and
+    database reads from different processes finish in any order, so a plain set could
+    replace a newer id with an older one and hide unread chat until the next message.
+    """
+    values = {latest_message_key(club_id): message_id for club_id, message_id in latest.items()}
+    backend = caches['default']
+    try:
+        if isinstance(backend, RedisCache):
+            client = backend._cache.get_client(write=True)
+            script = client.register_script(RAISE_SCRIPT)
+            for key, message_id in values.items():
+                script(keys=[backend.make_and_validate_key(key)], args=[message_id, settings.UNREAD_CACHE_TIMEOUT])
+            return
+        # Per-process caches have no other writers to race with
+        current = backend.get_many(list(values))
+        backend.set_many({key: message_id for key, message_id in values.items()
+                          if current.get(key) is None or current[key] < message_id}, settings.UNREAD_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Could not record latest chat messages: {str(e)}")
+
+
+def record_latest_message(club_id, message_id):
+    _raise_latest({club_id: message_id})
+
+
+def forget_latest_messages(club_ids):
+    _cache_call('delete_many', [latest_message_key(club_id) for club_id in club_ids])
+
+
+def forget_read_cursors(user_id):
+    _cache_call('delete', read_cursors_key(user_id))
+
+
+def read_cursors(user_id):
+    """{club_id: last_read_id} for every club chat the user reads, cached."""
+    cursors = _cache_call('get', read_cursors_key(user_id))
+    if cursors is None:
+        cursors = dict(ClubReadCursor.objects.filter(user_id=user_id).values_list('club_id', 'last_read_id'))
+        _cache_call('set', read_cursors_key(user_id), cursors, settings.UNREAD_CACHE_TIMEOUT)
+    return cursors
+
+
+def _latest_message_ids(club_ids):
+    keys = {latest_message_key(club_id): club_id for club_id in club_ids}
+    latest = {keys[key]: value for key, value in (_cache_call('get_many', list(keys)) or {}).items()}
+    missing = [club_id for club_id in club_ids if club_id not in latest]
+    if missing:
+        found = dict(
+            Message.objects.filter(club_id__in=missing).values('club_id')
+            .annotate(latest=Max('id')).values_list('club_id', 'latest')
+        )
+        filled = {club_id: found.get(club_id, 0) for club_id in missing}
+        # A message committed after the read may already have cached a newer id
+        _raise_latest(filled)
+        latest.update(filled)
+    return latest
+
+
+def unread_chat_summary(user):
+    """
+    ClubReadCursor.unread_summary, recomputed only when a cursor or a club's newest
+    message changed since it was last cached.
+    """
+    cursors = read_cursors(user.id)
+    if not cursors:
+        return []
+    latest = _latest_message_ids(list(cursors))
+    stamp = sorted((club_id, cursors[club_id], latest[club_id]) for club_id in cursors)
+
+    cached = _cache_call('get', chat_summary_key(user.id))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    if all(latest[club_id] <= last_read for club_id, last_read in cursors.items()):
+        summary = []
+    else:
+        summary = ClubReadCursor.unread_summary(user)
+    _cache_call('set', chat_summary_key(user.id), (stamp, summary), settings.UNREAD_CACHE_TIMEOUT)
+    return summary
@@ -1,10 +1,18 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile,Message,Membership,Club,Notification,Document,Event  # Make sure you adjust this for your actual Profile model
+from .models import Profile,Message,Membership,Club,ClubReadCursor,Notification,Document,Event  # Make sure you adjust this for your actual Profile model
 import logging
-from .tasks import send_new_message_email  # New Celery task
+from .tasks import send_new_message_email, fan_out_club_notification, enqueue  # Celery tasks
 from .utils.email_utils import send_html_email  # Import the email utility
+from .services.dashboard import forget_membership_stats
+from .services.events import touch_club_events
+from .services.membership import bump_user_clubs
+from .services.realtime import (
+    push_chat_activity, push_notifications, revoke_chat_membership, set_club_activity_subscription,
+)
+from .services.unread import bump_notification_version, forget_read_cursors, increment_unread, record_latest_message
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -51,6 +59,8 @@ def create_membership_notification(sender, instance, created, **kwargs):
         Notification.objects.create(
             user=instance.club.admin,
             club=instance.club,
+            kind=Notification.KIND_MEMBERSHIP_REQUEST,
+            target_id=instance.id,
             content=f"{instance.user.username} has requested to join {instance.club.name}"
         )
     elif not created and instance.status in ['approved', 'declined']:
@@ -59,86 +69,156 @@ def create_membership_notification(sender, instance, created, **kwargs):
         Notification.objects.create(
             user=instance.user,
             club=instance.club,
+            kind=Notification.KIND_MEMBERSHIP_DECISION,
+            target_id=instance.id,
             content=f"Your membership request for {instance.club.name} has been {status_text}"
         )
 
+@receiver(post_save, sender=Membership)
+def revoke_chat_access_on_status_change(sender, instance, created, **kwargs):
+    """Drop cached chat access on the user's open sockets when a membership stops being approved."""
+    if not created and instance.status != 'approved':
+        transaction.on_commit(lambda: revoke_chat_membership(instance.user_id, instance.club_id))
+
+@receiver(post_delete, sender=Membership)
+def revoke_chat_access_on_delete(sender, instance, **kwargs):
+    """Drop cached chat access on the user's open sockets when a membership is deleted."""
+    transaction.on_commit(lambda: revoke_chat_membership(instance.user_id, instance.club_id))
+
+@receiver(pre_save, sender=Membership)
+def remember_previous_status(sender, instance, **kwargs):
+    """Note the stored status, so only real approval changes touch read cursors."""
+    instance._previous_status = (
+        Membership.objects.filter(pk=instance.pk).values_list('status', flat=True).first() if instance.pk else None
+    )
+
+@receiver(post_save, sender=Membership)
+def sync_read_cursor_on_status_change(sender, instance, created, **kwargs):
+    """Start tracking unread chat when a membership is approved; stop when it no longer is."""
+    previous_status = getattr(instance, '_previous_status', None)
+    if (instance.status == 'approved') == (previous_status == 'approved'):
+        return  # Role edits and re-saves leave chat tracking as it is
+    if instance.status == 'approved':
+        ClubReadCursor.start(instance.user_id, instance.club_id)
+        transaction.on_commit(lambda: set_club_activity_subscription(instance.user_id, instance.club_id, True))
+    elif not created and instance.user_id != instance.club.admin_id:
+        ClubReadCursor.objects.filter(user_id=instance.user_id, club_id=instance.club_id).delete()
+        forget_read_cursors(instance.user_id)
+        transaction.on_commit(lambda: set_club_activity_subscription(instance.user_id, instance.club_id, False))
+
+@receiver(post_delete, sender=Membership)
+def remove_read_cursor_on_delete(sender, instance, **kwargs):
+    """Stop tracking unread chat for a removed member (the club admin keeps theirs)."""
+    removed, _ = ClubReadCursor.objects.filter(user_id=instance.user_id, club_id=instance.club_id).exclude(
+        club__admin_id=instance.user_id
+    ).delete()
+    forget_read_cursors(instance.user_id)
+    if removed:
+        transaction.on_commit(lambda: set_club_activity_subscription(instance.user_id, instance.club_id, False))
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def clear_membership_stats(sender, instance, **kwargs):
+    """Membership changes alter the club admin's dashboard chart."""
+    try:
+        admin_id = instance.club.admin_id
+    except Club.DoesNotExist:
+        return  # Deleted along with its club, which clears the chart itself
+    transaction.on_commit(lambda: forget_membership_stats(admin_id))
+
+@receiver(post_save, sender=Club)
+@receiver(post_delete, sender=Club)
+def clear_club_stats(sender, instance, **kwargs):
+    """Adding, renaming or deleting a club alters its admin's dashboard chart."""
+    transaction.on_commit(lambda: forget_membership_stats(instance.admin_id))
+
+@receiver(post_save, sender=User)
+def start_user_clubs(sender, instance, created, **kwargs):
+    """A new user has no clubs; drop any set cached for a reused id."""
+    if created:
+        bump_user_clubs([instance.id])
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def bump_member_clubs(sender, instance, **kwargs):
+    """
+    Replace the member's cached club set now, for the rest of this request, and again on
+    commit, in case another request re-cached the old set in between.
+    """
+    bump_user_clubs([instance.user_id])
+    transaction.on_commit(lambda: bump_user_clubs([instance.user_id]))
+
+@receiver(pre_save, sender=Club)
+def remember_previous_admin(sender, instance, **kwargs):
+    """Note the stored admin, so a reassigned club can be dropped from the old admin's set."""
+    instance._previous_admin_id = (
+        Club.objects.filter(pk=instance.pk).values_list('admin_id', flat=True).first() if instance.pk else None
+    )
+
+@receiver(post_save, sender=Club)
+@receiver(post_delete, sender=Club)
+def bump_admin_clubs(sender, instance, **kwargs):
+    """Replace the cached club sets of the admin and of any admin it replaced, as for memberships."""
+    user_ids = {instance.admin_id, getattr(instance, '_previous_admin_id', None)} - {None}
+    bump_user_clubs(user_ids)
+    transaction.on_commit(lambda: bump_user_clubs(user_ids))
+
 @receiver(post_save, sender=Message)
-def create_message_notification(sender, instance, created, **kwargs):
-    """Create notifications for club members when a new message is created."""
+def remember_latest_message(sender, instance, created, **kwargs):
+    """Keep each club's newest message id cached and tell members' notification sockets."""
+    if created:
+        club_name = instance.club.name
+
+        def on_commit():
+            record_latest_message(instance.club_id, instance.id)
+            push_chat_activity(instance, club_name)
+        transaction.on_commit(on_commit)
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    """Bump the recipient's unread counter and push the notification (bulk fan-outs do both themselves)."""
+    if created and not instance.is_read:
+        def on_commit():
+            increment_unread([instance.user_id])
+            bump_notification_version([instance.user_id])
+            push_notifications([instance])
+        transaction.on_commit(on_commit)
+
+@receiver(post_save, sender=Club)
+def create_admin_read_cursor(sender, instance, created, **kwargs):
+    """Club admins read the chat without a Membership, so their cursor starts with the club."""
     if created:
-        # Get all approved members of the club (excluding the sender)
-        club_members = Membership.objects.filter(
-            club=instance.club, 
-            status='approved'
-        ).exclude(user=instance.sender).values_list('user', flat=True)
-        
-        # Always include the club admin if they're not the sender
-        if instance.club.admin != instance.sender:
-            club_members = list(club_members) + [instance.club.admin.id]
-        
-        # Create notifications for all club members
-        notifications_to_create = []
-        for member_id in club_members:
-            notifications_to_create.append(
-                Notification(
-                    user_id=member_id,
-                    club=instance.club,
-                    message=instance,
-                    content=f"New message from {instance.sender.username} in {instance.club.name}"
-                )
-            )
-        
-        # Bulk create notifications for better performance
-        if notifications_to_create:
-            Notification.objects.bulk_create(notifications_to_create)
+        ClubReadCursor.start(instance.admin_id, instance.id)
 
 @receiver(post_save, sender=Document)
 def create_document_notification(sender, instance, created, **kwargs):
-    """Create notifications for club members when a new document is uploaded."""
+    """Notify club members (except the uploader) of a new document, in the background."""
     if created:
-        # Get all approved members of the club (excluding the uploader)
-        club_members = Membership.objects.filter(
-            club=instance.club, 
-            status='approved'
-        ).exclude(user=instance.uploaded_by).values_list('user', flat=True)
-        
-        # Always include the club admin if they're not the uploader
-        if instance.club.admin != instance.uploaded_by:
-            club_members = list(club_members) + [instance.club.admin.id]
-        
-        # Create notifications for all club members
-        notifications_to_create = []
-        for member_id in club_members:
-            notifications_to_create.append(
-                Notification(
-                    user_id=member_id,
-                    club=instance.club,
-                    content=f"New document '{instance.title}' has been shared in {instance.club.name}. Check the documents section!"
-                )
-            )
-        
-        # Bulk create notifications for better performance
-        if notifications_to_create:
-            Notification.objects.bulk_create(notifications_to_create)
+        args = (
+            instance.club_id,
+            Notification.KIND_DOCUMENT,
+            instance.id,
+            f"New document '{instance.title}' has been shared in {instance.club.name}. Check the documents section!",
+            instance.uploaded_by_id,
+            instance.uploaded_by_id,
+        )
+        transaction.on_commit(lambda: enqueue(fan_out_club_notification, *args))
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def touch_event_calendar(sender, instance, **kwargs):
+    """Move the club calendar's Last-Modified, now and again once the change is visible."""
+    touch_club_events(instance.club_id)
+    transaction.on_commit(lambda: touch_club_events(instance.club_id))
 
 @receiver(post_save, sender=Event)
 def create_event_reminder_notification(sender, instance, created, **kwargs):
-    """Create notifications for event reminders."""
+    """Notify club members of a new event, in the background."""
     if created and instance.reminder_time != 'none':
-        # Get all members of the club
-        club_members = instance.club.get_all_members()
-        
-        # Create notifications for all club members
-        notifications_to_create = []
-        for member in club_members:
-            notifications_to_create.append(
-                Notification(
-                    user=member.user,
-                    club=instance.club,
-                    content=f"New event '{instance.title}' scheduled for {instance.event_date.strftime('%B %d, %Y at %I:%M %p')} in {instance.club.name}"
-                )
-            )
-        
-        # Bulk create notifications for better performance
-        if notifications_to_create:
-            Notification.objects.bulk_create(notifications_to_create)
+        args = (
+            instance.club_id,
+            Notification.KIND_EVENT,
+            instance.id,
+            f"New event '{instance.title}' scheduled for {instance.event_date.strftime('%B %d, %Y at %I:%M %p')} in {instance.club.name}",
+        )
+        transaction.on_commit(lambda: enqueue(fan_out_club_notification, *args))
@@ -15,6 +15,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const messageForm = document.querySelector('form[method="post"]'); // Assuming this is your message form
         const messageInput = document.getElementById('message-input');
         const messageContainer = document.getElementById('chat-area'); // Where messages are displayed
+        const chatBox = messageContainer ? messageContainer.closest('.chat-box') : null; // Scrollable wrapper around the chat area
         const typingIndicator = document.getElementById('typing-indicator');
         const submitButton = messageForm ? messageForm.querySelector('button[type="submit"]') : null;
         // const loadingSpinner = document.getElementById('loadingSpinner'); // Optional: for visual feedback (Currently not used in new flow)
@@ -28,8 +29,11 @@ document.addEventListener('DOMContentLoaded', function() {
         function connectWebSocket() {
             try {
                 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+                // Ask the server to replay anything posted after the newest message we have
+                const lastSeenId = getLastSeenMessageId();
+                const query = lastSeenId ? `?last_seen_message_id=${encodeURIComponent(lastSeenId)}` : '';
                 chatSocket = new WebSocket(
-                    protocol + '//' + window.location.host + '/ws/chat/' + roomName + '/'
+                    protocol + '//' + window.location.host + '/ws/chat/' + roomName + '/' + query
                 );
 
                 chatSocket.onopen = function(e) {
@@ -48,7 +52,12 @@ document.addEventListener('DOMContentLoaded', function() {
                     console.log('WebSocket connection closed. Code:', e.code, 'Reason:', e.reason);
                     isConnected = false;
                     updateConnectionStatus(false);
-                    
+
+                    // 4003: membership revoked by the server, reconnecting would be refused
+                    if (e.code === 4003) {
+                        return;
+                    }
+
                     // Attempt to reconnect if not a normal closure (1000) and within attempt limits
                     if (e.code !== 1000 && reconnectAttempts < maxReconnectAttempts) {
                         reconnectAttempts++;
@@ -70,9 +79,16 @@ document.addEventListener('DOMContentLoaded', function() {
                             case 'chat_message':
                                 handleChatMessage(data);
                                 break;
+                            case 'replay':
+                                handleReplay(data);
+                                break;
                             case 'typing':
                                 handleTypingIndicator(data);
                                 break;
+                            case 'presence':
+                            case 'presence_delta':
+                                handlePresence(data);
+                                break;
                             case 'error':
                                 handleErrorFromServer(data);
                                 break;
@@ -89,8 +105,26 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         }
 
+        // Id of the newest confirmed message on screen, used as the resume cursor
+        function getLastSeenMessageId() {
+            if (!messageContainer) return null;
+            const confirmed = messageContainer.querySelectorAll('[data-message-id]');
+            return confirmed.length ? confirmed[confirmed.length - 1].dataset.messageId : null;
+        }
+
+        function handleReplay(data) {
+            // data = { type: 'replay', messages: [...], done: boolean, truncated: boolean }
+            data.messages.forEach(handleChatMessage);
+            if (data.truncated) {
+                showError('You missed too many messages while disconnected. Please refresh the page to see them all.');
+            }
+        }
+
         function handleChatMessage(data) {
             // data = { type: 'chat_message', id: db_id, message: content, username: sender, timestamp: iso_ts, temp_id: client_temp_id }
+            if (data.id && messageContainer && messageContainer.querySelector(`[data-message-id="${data.id}"]`)) {
+                return; // Already on screen, e.g. delivered by both a replay and the live stream
+            }
             const existingOptimisticMessage = data.temp_id ? document.querySelector(`[data-temp-id="${data.temp_id}"]`) : null;
 
             if (existingOptimisticMessage) {
@@ -149,24 +183,74 @@ document.addEventListener('DOMContentLoaded', function() {
             if (submitButton) submitButton.disabled = !connected; // Disable send if not connected
         }
 
+        // Usernames currently online in this room: a snapshot on connect, then deltas
+        let onlineUsers = new Set();
+        const onlineUsersElement = document.getElementById('online-users');
+
+        function handlePresence(data) {
+            // data = { type: 'presence', users: [...] } or { type: 'presence_delta', joined: [...], left: [...] }
+            if (data.type === 'presence') {
+                onlineUsers = new Set(data.users);
+            } else {
+                data.joined.forEach(name => onlineUsers.add(name));
+                data.left.forEach(name => onlineUsers.delete(name));
+            }
+            if (onlineUsersElement) {
+                const names = [...onlineUsers].sort();
+                onlineUsersElement.textContent = names.length ? `Online: ${names.join(', ')}` : '';
+            }
+        }
+
+        // Latest typing snapshot per server process; the server coalesces typing state per room
+        // and re-sends non-empty snapshots, so one that is not refreshed within its ttl is dropped
+        // (its process may have restarted before sending the final empty snapshot)
+        const typingByOrigin = {};
+        let typingExpiryTimer = null;
+
         function handleTypingIndicator(data) {
-            // data = { type: 'typing', typing: boolean, username: sender }
-            if (typingIndicator) {
-                if (data.typing && data.username !== username) { // Don't show own typing
-                    typingIndicator.textContent = `${escapeHtml(data.username)} is typing...`;
-                    typingIndicator.style.display = 'block';
-                } else {
-                    typingIndicator.textContent = '';
-                    typingIndicator.style.display = 'none';
-                }
+            // data = { type: 'typing', origin: server_process_id, users: [usernames], ttl: seconds }
+            if (data.users.length) {
+                typingByOrigin[data.origin] = {users: data.users, expiresAt: Date.now() + data.ttl * 1000};
+            } else {
+                delete typingByOrigin[data.origin];
             }
+            renderTypingIndicator();
         }
 
-        // Display a message in the chat area
-        // Parameters: message content, sender's username, boolean if it's own message, ISO timestamp, DB message ID, temporary ID
-        function displayMessage(messageContent, senderUsername, isOwnMessage = false, isoTimestamp = null, dbId = null, tempId = null) {
-            if (!messageContainer) return;
+        function renderTypingIndicator() {
+            const now = Date.now();
+            Object.keys(typingByOrigin).forEach(origin => {
+                if (typingByOrigin[origin].expiresAt <= now) delete typingByOrigin[origin];
+            });
+            const pending = Object.keys(typingByOrigin).length > 0;
+            if (pending && typingExpiryTimer === null) {
+                typingExpiryTimer = setInterval(renderTypingIndicator, 1000);
+            } else if (!pending && typingExpiryTimer !== null) {
+                clearInterval(typingExpiryTimer);
+                typingExpiryTimer = null;
+            }
+            if (!typingIndicator) return;
+
+            const typers = [...new Set(Object.values(typingByOrigin).flatMap(snapshot => snapshot.users))]
+                .filter(name => name !== username); // Don't show own typing
+            if (typers.length === 0) {
+                typingIndicator.textContent = '';
+                typingIndicator.style.display = 'none';
+                return;
+            }
+            if (typers.length === 1) {
+                typingIndicator.textContent = `${typers[0]} is typing...`;
+            } else if (typers.length === 2) {
+                typingIndicator.textContent = `${typers[0]} and ${typers[1]} are typing...`;
+            } else {
+                typingIndicator.textContent = 'Several people are typing...';
+            }
+            typingIndicator.style.display = 'block';
+        }
 
+        // Build the DOM element for a chat message
+        // Parameters: message content, sender's username, boolean if it's own message, ISO timestamp, DB message ID, temporary ID, avatar URL
+        function createMessageElement(messageContent, senderUsername, isOwnMessage = false, isoTimestamp = null, dbId = null, tempId = null, avatarUrl = null) {
             const messageDiv = document.createElement("div");
             // Add common classes and alignment based on whether it's user's own message
             messageDiv.classList.add("chat-message", isOwnMessage ? "text-end" : "text-start", "mb-3", "d-flex", isOwnMessage ? "justify-content-end" : "justify-content-start");
@@ -181,11 +265,6 @@ document.addEventListener('DOMContentLoaded', function() {
 
             if (tempId && !dbId) { // If it's an optimistic message not yet confirmed
                 messageBubble.classList.add('optimistic-message');
-                // Optionally add a pending indicator inside the bubble
-                const pendingSpan = document.createElement('small');
-                pendingSpan.className = 'pending-indicator fst-italic ms-1';
-                pendingSpan.textContent = '(sending...)';
-                // Append later
             }
 
             const displayName = isOwnMessage ? "You" : escapeHtml(senderUsername);
@@ -211,13 +290,76 @@ document.addEventListener('DOMContentLoaded', function() {
                 messageBubble.querySelector('small').appendChild(pendingSpan);
             }
 
+            // Avatars are shown for other users' messages when the server provides one (history pages)
+            if (avatarUrl && !isOwnMessage) {
+                const avatar = document.createElement('img');
+                avatar.src = avatarUrl;
+                avatar.alt = `${senderUsername}'s avatar`;
+                avatar.className = 'rounded-circle me-3 shadow-sm';
+                avatar.style.cssText = 'width: 50px; height: 50px; object-fit: cover;';
+                messageDiv.appendChild(avatar);
+            }
 
             messageDiv.appendChild(messageBubble);
-            messageContainer.appendChild(messageDiv);
-            
+            return messageDiv;
+        }
+
+        // Display a message at the bottom of the chat area
+        function displayMessage(messageContent, senderUsername, isOwnMessage = false, isoTimestamp = null, dbId = null, tempId = null) {
+            if (!messageContainer) return;
+
+            messageContainer.appendChild(
+                createMessageElement(messageContent, senderUsername, isOwnMessage, isoTimestamp, dbId, tempId)
+            );
+
             scrollToBottom();
         }
 
+        // Load the page of messages older than the oldest one on screen and prepend it,
+        // keeping the user's scroll position stable
+        let loadingHistory = false;
+        function loadOlderMessages() {
+            if (typeof historyUrl === 'undefined' || !hasMoreHistory || loadingHistory || !messageContainer || !chatBox) return;
+            const oldestMessage = messageContainer.querySelector('[data-message-id]');
+            if (!oldestMessage) return;
+
+            loadingHistory = true;
+            fetch(`${historyUrl}?before=${encodeURIComponent(oldestMessage.dataset.messageId)}`, {
+                headers: { 'Accept': 'application/json' }
+            })
+                .then(response => {
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    return response.json();
+                })
+                .then(data => {
+                    const previousHeight = chatBox.scrollHeight;
+                    const fragment = document.createDocumentFragment();
+                    data.messages.forEach(m => {
+                        fragment.appendChild(createMessageElement(
+                            m.message, m.username, m.username === username, m.timestamp, m.id, null,
+                            m.avatar_url || avatarPlaceholderUrl
+                        ));
+                    });
+                    messageContainer.insertBefore(fragment, messageContainer.firstChild);
+                    chatBox.scrollTop += chatBox.scrollHeight - previousHeight;
+                    hasMoreHistory = data.has_more;
+                })
+                .catch(error => {
+                    console.error('Error loading older messages:', error);
+                })
+                .finally(() => {
+                    loadingHistory = false;
+                });
+        }
+
+        if (chatBox) {
+            chatBox.addEventListener('scroll', function() {
+                if (chatBox.scrollTop < 50) {
+                    loadOlderMessages();
+                }
+            });
+        }
+
         function escapeHtml(text) {
             if (typeof text !== 'string') return '';
             const div = document.createElement('div');
@@ -226,9 +368,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         function scrollToBottom() {
-            if (messageContainer) {
+            const scroller = chatBox || messageContainer;
+            if (scroller) {
                 setTimeout(() => { // Ensure DOM update before scrolling
-                    messageContainer.scrollTop = messageContainer.scrollHeight;
+                    scroller.scrollTop = scroller.scrollHeight;
                 }, 10);
             }
         }
@@ -318,18 +461,26 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         // Handle typing indicators
+        // "typing: true" is re-sent at most every 2s while the user types; the server
+        // expires typers that stop refreshing, so this stays well within its TTL
         let typingTimeout;
+        let lastTypingSentAt = 0;
         if (messageInput) {
             messageInput.addEventListener('input', function() {
                 if (chatSocket && isConnected) {
-                    chatSocket.send(JSON.stringify({
-                        type: 'typing', // New type for consumer
-                        typing: true
-                        // Username from scope on server
-                    }));
+                    const now = Date.now();
+                    if (now - lastTypingSentAt > 2000) {
+                        lastTypingSentAt = now;
+                        chatSocket.send(JSON.stringify({
+                            type: 'typing', // New type for consumer
+                            typing: true
+                            // Username from scope on server
+                        }));
+                    }
 
                     clearTimeout(typingTimeout);
                     typingTimeout = setTimeout(() => {
+                        lastTypingSentAt = 0;
                         if (chatSocket && isConnected) {
                             chatSocket.send(JSON.stringify({
                                 type: 'typing',
@@ -341,6 +492,13 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
 
+        // Heartbeats keep this socket listed as online; the server expires silent sockets
+        setInterval(() => {
+            if (chatSocket && isConnected) {
+                chatSocket.send(JSON.stringify({ type: 'heartbeat' }));
+            }
+        }, 25000);
+
         // Initialize WebSocket connection when everything is set up
         connectWebSocket();
 
@@ -0,0 +1,116 @@
+// Live notification badge and dropdown, fed by the per-user notification socket
+document.addEventListener('DOMContentLoaded', function() {
+    const badge = document.getElementById('notification-badge');
+    const list = document.getElementById('notification-list');
+    if (!badge || !list) {
+        return; // Not logged in
+    }
+
+    let reconnectAttempts = 0;
+    const maxReconnectAttempts = 10;
+
+    function setBadge(count) {
+        count = Math.max(0, count);
+        badge.dataset.count = count;
+        badge.textContent = count > 9 ? `${count}+` : `${count}`;
+        badge.classList.toggle('d-none', count === 0);
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function removeEmptyPlaceholder() {
+        const empty = document.getElementById('notification-empty');
+        if (empty) {
+            empty.remove();
+        }
+    }
+
+    function addNotification(frame) {
+        const notification = frame.notification;
+        // A merged notification replaces its earlier row
+        const existing = list.querySelector(`.notification-link[data-id="${notification.id}"]`);
+        if (existing) {
+            existing.closest('li').remove();
+        }
+        removeEmptyPlaceholder();
+        const item = document.createElement('li');
+        item.className = 'notification-item bg-info bg-opacity-10 px-3 py-2 border-bottom';
+        item.innerHTML = `
+            <a href="${escapeHtml(notification.url)}" class="d-block text-decoration-none text-dark notification-link" data-id="${notification.id}">
+                <span class="fw-semibold">${escapeHtml(notification.content)}</span><br>
+                <small class="text-muted">just now</small>
+            </a>`;
+        // Unread chat rows stay above the notification items, as when the page is rendered
+        const items = document.getElementById('notification-items');
+        items.insertBefore(item, items.firstChild);
+        setBadge(parseInt(badge.dataset.count, 10) + frame.unread_delta);
+    }
+
+    function addChatActivity(frame) {
+        // Messages in the chat the user is looking at are read as they arrive
+        if (typeof roomName !== 'undefined' && roomName === `club_${frame.club_id}`) {
+            return;
+        }
+        let row = list.querySelector(`[data-chat-club="${frame.club_id}"]`);
+        if (!row) {
+            removeEmptyPlaceholder();
+            row = document.createElement('li');
+            row.className = 'notification-item bg-info bg-opacity-10 px-3 py-2 border-bottom';
+            row.dataset.chatClub = frame.club_id;
+            row.dataset.unread = 0;
+            row.innerHTML = `
+                <a href="${escapeHtml(frame.url)}" class="d-block text-decoration-none text-dark notification-link">
+                    <span class="fw-semibold chat-unread-text"></span><br>
+                    <small class="text-muted">just now</small>
+                </a>`;
+            list.insertBefore(row, list.firstChild);
+            // The badge counts clubs with unread chat, not individual messages
+            setBadge(parseInt(badge.dataset.count, 10) + 1);
+        }
+        // One frame per club per server tick, covering every message sent in it
+        const unread = parseInt(row.dataset.unread, 10) + frame.new_messages;
+        row.dataset.unread = unread;
+        row.querySelector('.chat-unread-text').textContent =
+            `${unread} new message${unread === 1 ? '' : 's'} in ${frame.club_name}`;
+    }
+
+    function markAllRead() {
+        setBadge(0);
+        list.querySelectorAll('[data-chat-club]').forEach(row => row.remove());
+        list.querySelectorAll('.notification-item').forEach(item => item.classList.remove('bg-info', 'bg-opacity-10'));
+    }
+
+    function connect() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/ws/notifications/`);
+
+        socket.onopen = function() {
+            reconnectAttempts = 0;
+        };
+
+        socket.onmessage = function(e) {
+            const frame = JSON.parse(e.data);
+            if (frame.type === 'notification') {
+                addNotification(frame);
+            } else if (frame.type === 'chat_activity') {
+                addChatActivity(frame);
+            } else if (frame.type === 'notifications_read') {
+                markAllRead();
+            }
+        };
+
+        socket.onclose = function(e) {
+            // The badge is re-rendered on the next page load, so giving up is harmless
+            if (e.code !== 1000 && reconnectAttempts < maxReconnectAttempts) {
+                reconnectAttempts++;
+                setTimeout(connect, Math.min(30000, 1000 * 2 ** reconnectAttempts));
+            }
+        };
+    }
+
+    connect();
+});
@@ -1,5 +1,18 @@
+import logging
+import time
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from .models import Club, Membership, Notification, NotificationSource
+from .services.realtime import push_notifications
+from .services.unread import bump_notification_version, forget_unread, increment_unread, set_unread_counts
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -12,3 +25,115 @@ def send_new_message_email(sender_name, recipient_email, content):
     except Exception as e:
         # Log email sending issues (if using a logger)
         print(f"Email sending failed: {e}")
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def fan_out_club_notification(self, club_id, kind, target_id, content, exclude_user_id=None, actor_id=None):
+    """
+    Notify every approved member and the admin of a club about one object (`kind`, `target_id`).
+
+    Members are processed in batches of NOTIFICATION_FANOUT_BATCH_SIZE with
+    Notification.upsert, which merges coalesced kinds into each member's unread row
+    and skips members already notified about the object, so retries are harmless.
+    """
+    source_key = f"{kind}:{target_id}"
+    club = Club.objects.filter(id=club_id).only('id', 'name', 'admin_id').first()
+    if club is None:
+        return 0  # Club deleted before the task ran
+    actor = get_user_model().objects.filter(id=actor_id).first() if actor_id else None
+
+    user_ids = set(Membership.objects.filter(club_id=club_id, status='approved').values_list('user_id', flat=True))
+    user_ids.add(club.admin_id)
+    user_ids.discard(exclude_user_id)
+    user_ids = sorted(user_ids)
+
+    batch_size = settings.NOTIFICATION_FANOUT_BATCH_SIZE
+    try:
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with transaction.atomic():
+                new_ids = Notification.upsert(batch, club, kind, source_key, content, actor, target_id)
+            # Merged rows were already unread, so only new rows change the counters
+            increment_unread(new_ids)
+            bump_notification_version(batch)
+            push_notifications(
+                Notification.objects.filter(source_key=source_key, user_id__in=batch), set(new_ids)
+            )
+    except Exception as e:
+        logger.error(f"Notification fan-out '{source_key}' for club {club_id} failed: {str(e)}")
+        raise self.retry(exc=e)
+    return len(user_ids)
+
+
+@shared_task
+def reconcile_unread_counters(batch_size=1000):
+    """Rewrite every user's cached unread-notification count from the database, repairing drift."""
+    counts = dict(
+        Notification.objects.filter(is_read=False).values('user_id')
+        .annotate(unread=Count('id')).values_list('user_id', 'unread')
+    )
+    user_ids = list(get_user_model().objects.values_list('id', flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        set_unread_counts({user_id: counts.get(user_id, 0) for user_id in user_ids[start:start + batch_size]})
+    return len(user_ids)
+
+
+@shared_task
+def prune_notifications(max_age_days=None, max_per_user=None, batch_size=None):
+    """
+    Delete read notifications older than `max_age_days`, then each user's oldest rows
+    beyond `max_per_user`. Settings supply the defaults.
+
+    Deletes run one primary-key range (or id list) of `batch_size` per statement, so no
+    single statement holds locks on a large part of the table. Nothing references
+    Notification, so each delete is a single DELETE without fetching rows first.
+    """
+    max_age_days = settings.NOTIFICATION_RETENTION_DAYS if max_age_days is None else max_age_days
+    max_per_user = settings.NOTIFICATION_MAX_PER_USER if max_per_user is None else max_per_user
+    batch_size = batch_size or settings.NOTIFICATION_PRUNE_BATCH_SIZE
+    started = time.monotonic()
+
+    expired = 0
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    bounds = Notification.objects.filter(is_read=True, timestamp__lt=cutoff).aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is not None:
+        for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+            expired += Notification.objects.filter(
+                id__gte=low, id__lt=low + batch_size, is_read=True, timestamp__lt=cutoff
+            ).delete()[0]
+
+    over_cap = 0
+    capped_users = list(
+        Notification.objects.values('user_id').annotate(total=Count('id'))
+        .filter(total__gt=max_per_user).values_list('user_id', flat=True)
+    )
+    for user_id in capped_users:
+        ids = list(Notification.objects.filter(user_id=user_id).values_list('id', flat=True)[max_per_user:])
+        for start in range(0, len(ids), batch_size):
+            over_cap += Notification.objects.filter(id__in=ids[start:start + batch_size]).delete()[0]
+    # Capped rows may have been unread or listed in a cached dropdown
+    forget_unread(capped_users)
+    bump_notification_version(capped_users)
+
+    # Fan-out retries happen within minutes, so sources past retention can be forgotten
+    NotificationSource.objects.filter(created_at__lt=cutoff).delete()
+
+    elapsed = time.monotonic() - started
+    deleted = expired + over_cap
+    stats = {
+        'expired': expired,
+        'over_cap': over_cap,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(deleted / elapsed, 1) if elapsed else float(deleted),
+    }
+    logger.info(f"Pruned {deleted} notifications: {stats}")
+    return stats
+
+
+def enqueue(task, *args):
+    """Send a task to the broker, running it in-process if the broker cannot be reached."""
+    try:
+        task.delay(*args)
+    except Exception as e:
+        logger.error(f"Could not queue '{task.name}', running it inline: {str(e)}")
+        task.apply(args=args)
@@ -1,12 +1,46 @@
-from django.test import TestCase
+import asyncio
+import json
+import re
+import threading
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import Count, F
+from django.db.models.query import QuerySet
 from django.urls import reverse
-from .models import Club,Profile,Message
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from .models import Club,ClubReadCursor,Event,Profile,Message,Membership,Notification
+from .consumers import ChatConsumer
+from .routing import websocket_urlpatterns
+from .services.db import database_sync_to_async
+from .services.membership import user_club_ids
+from .services.realtime import club_activity_group
+from .services.unread import record_latest_message
+from .tasks import fan_out_club_notification, prune_notifications
+from .context_processors import unread_notifications
 from django.core.exceptions import ValidationError
 from unittest.mock import patch
 from django.contrib.auth.models import User
 
-class MessageModelTest(TestCase):
+class IsolatedCacheTestCase(TestCase):
+    """Starts every test with an empty cache, so counters and club sets never leak between tests."""
+
     def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class MessageModelTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
         # Create users and profiles
         self.sender = User.objects.create(username="sender")
         self.receiver = User.objects.create(username="receiver")
@@ -55,8 +89,50 @@ class MessageModelTest(TestCase):
         )
 
 
-class ClubListViewTest(TestCase):
+class MessageBulkIngestTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.member = User.objects.create_user(username="member", password="secret")
+        self.outsider = User.objects.create_user(username="outsider", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        Membership.objects.create(user=self.member, club=self.club, status='approved')
+
+    def test_rejects_non_members_and_escapes_content(self):
+        messages = [
+            Message(club=self.club, sender=self.admin, content="<b>hi</b>"),
+            Message(club=self.club, sender=self.member, content="hello"),
+            Message(club=self.club, sender=self.outsider, content="spam"),
+        ]
+        # Club admins, memberships and one batched insert (inside a savepoint), regardless of message count
+        with self.assertNumQueries(5):
+            created, rejected = Message.bulk_ingest(messages, batch_size=10)
+        self.assertEqual([m.sender for m in rejected], [self.outsider])
+        self.assertEqual(list(self.club.messages.values_list('content', flat=True)), ["&lt;b&gt;hi&lt;/b&gt;", "hello"])
+
+    def test_keeps_timestamps_and_skips_existing_ids(self):
+        sent_at = timezone.now() - timedelta(days=30)
+        existing = Message.objects.create(club=self.club, sender=self.admin, content="old")
+        created, rejected = Message.bulk_ingest([
+            Message(id=existing.id, club=self.club, sender=self.admin, content="duplicate", timestamp=sent_at),
+            Message(id=existing.id + 1, club=self.club, sender=self.member, content="restored", timestamp=sent_at),
+        ], escape_content=False, ignore_conflicts=True)
+        self.assertEqual([m.id for m in created], [existing.id + 1])
+        self.assertEqual(Message.objects.get(id=existing.id + 1).timestamp, sent_at)
+        self.assertEqual(Message.objects.get(id=existing.id).content, "old")
+
+    def test_keeps_timestamps_of_new_messages_when_ignoring_conflicts(self):
+        sent_at = timezone.now() - timedelta(days=30)
+        created, rejected = Message.bulk_ingest([
+            Message(club=self.club, sender=self.member, content="imported", timestamp=sent_at),
+        ], ignore_conflicts=True)
+        self.assertIsNotNone(created[0].pk)
+        self.assertEqual(Message.objects.get(content="imported").timestamp, sent_at)
+
+
+class ClubListViewTest(IsolatedCacheTestCase):
     def setUp(self):
+        super().setUp()
         # Set up multiple test clubs
         Club.objects.create(name="Chess Club", description="A place to enjoy chess")
         Club.objects.create(name="Basketball Club", description="A basketball team")
@@ -84,5 +160,821 @@ class ClubListViewTest(TestCase):
         self.assertContains(response, "No clubs found.")
 
 
+# TestCase data lives in an uncommitted transaction on the test thread's connection,
+# so consumer queries must stay on that thread rather than the CHAT_DB_WORKERS pool
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   CHAT_DB_WORKERS=0)
+class ChatConsumerTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.member = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        self.membership = Membership.objects.create(user=self.member, club=self.club, status='approved')
+
+    async def _connect(self, user, query=''):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/chat/club_{self.club.id}/{query}")
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def _receive(self, communicator):
+        """Return the next frame that is not a presence snapshot or delta."""
+        while True:
+            frame = await communicator.receive_json_from()
+            if frame['type'] not in ('presence', 'presence_delta'):
+                return frame
+
+    async def test_member_message_is_saved_and_acknowledged(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({'type': 'chat_message', 'message': 'Hello', 'temp_id': 'temp_1'})
+        response = await self._receive(communicator)
+        self.assertEqual(response['type'], 'chat_message')
+        self.assertEqual(response['temp_id'], 'temp_1')
+        self.assertTrue(await Message.objects.filter(id=response['id'], sender=self.member).aexists())
+        await communicator.disconnect()
+
+    async def test_deleting_membership_revokes_open_socket(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+
+        def delete_membership():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.membership.delete()
+        await sync_to_async(delete_membership)()
+
+        response = await self._receive(communicator)
+        self.assertEqual(response['type'], 'error')
+        close = await communicator.receive_output()
+        self.assertEqual(close, {'type': 'websocket.close', 'code': 4003})
+        await communicator.disconnect()
+
+    @override_settings(CHAT_WRITE_BEHIND_WINDOW=0.05)
+    async def test_write_behind_batches_preserve_order(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+
+        for i in range(3):
+            await communicator.send_json_to({'type': 'chat_message', 'message': f'Message {i}', 'temp_id': f'temp_{i}'})
+        responses = [await self._receive(communicator) for _ in range(3)]
+
+        self.assertEqual([r['temp_id'] for r in responses], ['temp_0', 'temp_1', 'temp_2'])
+        ids = [r['id'] for r in responses]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(await Message.objects.filter(club=self.club).acount(), 3)
+        await communicator.disconnect()
+
+    @override_settings(CHAT_WRITE_BEHIND_WINDOW=0.05)
+    async def test_failed_broadcast_does_not_stall_the_batch(self):
+        original = ChatConsumer.broadcast_message
+
+        async def broadcast_or_fail(consumer, message, temp_id):
+            if temp_id == 'temp_0':
+                raise RuntimeError("channel layer unavailable")
+            await original(consumer, message, temp_id)
+
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+        with patch.object(ChatConsumer, 'broadcast_message', broadcast_or_fail):
+            for i in range(3):
+                await communicator.send_json_to({'type': 'chat_message', 'message': f'Message {i}', 'temp_id': f'temp_{i}'})
+            responses = [await self._receive(communicator) for _ in range(3)]
+
+        self.assertEqual([(r['type'], r['temp_id']) for r in responses],
+                         [('error', 'temp_0'), ('chat_message', 'temp_1'), ('chat_message', 'temp_2')])
+        await communicator.disconnect()
+
+    @override_settings(CHAT_REPLAY_BATCH_SIZE=2)
+    async def test_reconnect_replays_missed_messages_in_batches(self):
+        create = sync_to_async(Message.objects.create)
+        seen = await create(club=self.club, sender=self.admin, content="Seen")
+        missed = [await create(club=self.club, sender=self.admin, content=f"Missed {i}") for i in range(3)]
+
+        communicator, connected = await self._connect(self.member, f"?last_seen_message_id={seen.id}")
+        self.assertTrue(connected)
+
+        first = await self._receive(communicator)
+        second = await self._receive(communicator)
+        self.assertEqual(first['type'], 'replay')
+        self.assertFalse(first['done'])
+        self.assertTrue(second['done'])
+        replayed = [m['id'] for m in first['messages'] + second['messages']]
+        self.assertEqual(replayed, [m.id for m in missed])
+        await communicator.disconnect()
+
+    @override_settings(CHAT_TYPING_TICK=0.05)
+    async def test_typing_frames_are_coalesced_into_snapshots(self):
+        typist, _ = await self._connect(self.member)
+        listener, _ = await self._connect(self.admin)
+
+        for _ in range(5):
+            await typist.send_json_to({'type': 'typing', 'typing': True})
+        snapshot = await self._receive(listener)
+        self.assertEqual(snapshot['users'], ['member'])
+        self.assertTrue(await listener.receive_nothing(timeout=0.2))
+
+        await typist.send_json_to({'type': 'typing', 'typing': False})
+        snapshot = await self._receive(listener)
+        self.assertEqual(snapshot['users'], [])
+        await typist.disconnect()
+        await listener.disconnect()
+
+    @override_settings(CHAT_TYPING_TICK=0.05, CHAT_TYPING_TTL=0.4)
+    async def test_typing_is_tracked_per_socket_and_re_sent(self):
+        tab_1, _ = await self._connect(self.member)
+        tab_2, _ = await self._connect(self.member)
+        listener, _ = await self._connect(self.admin)
+
+        await tab_1.send_json_to({'type': 'typing', 'typing': True})
+        await tab_2.send_json_to({'type': 'typing', 'typing': True})
+        snapshot = await self._receive(listener)
+        self.assertEqual((snapshot['users'], snapshot['ttl']), (['member'], 0.4))
+
+        # Closing one tab leaves the other typing, and the unchanged snapshot is re-sent
+        await tab_1.disconnect()
+        await tab_2.send_json_to({'type': 'typing', 'typing': True})
+        self.assertEqual((await self._receive(listener))['users'], ['member'])
+        await tab_2.disconnect()
+        self.assertEqual((await self._receive(listener))['users'], [])
+        await listener.disconnect()
+
+    async def test_presence_snapshot_and_deltas_track_open_sockets(self):
+        member, _ = await self._connect(self.member)
+        snapshot = await member.receive_json_from()
+        self.assertEqual(snapshot, {'type': 'presence', 'users': ['member']})
+        self.assertEqual((await member.receive_json_from())['joined'], ['member'])
+
+        admin_tab_1, _ = await self._connect(self.admin)
+        admin_tab_2, _ = await self._connect(self.admin)
+        self.assertEqual((await member.receive_json_from())['joined'], ['admin'])
+
+        # The admin stays online until their last tab closes
+        await admin_tab_1.disconnect()
+        self.assertTrue(await member.receive_nothing(timeout=0.1))
+        await admin_tab_2.disconnect()
+        self.assertEqual((await member.receive_json_from())['left'], ['admin'])
+
+        response = await sync_to_async(self._get_presence)()
+        self.assertEqual(response, {'count': 1, 'online': ['member']})
+        await member.disconnect()
+
+    def _get_presence(self):
+        self.client.force_login(self.admin)
+        return self.client.get(reverse('club_presence', args=[self.club.id])).json()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   CHAT_DB_WORKERS=0, CHAT_ACTIVITY_TICK=0)
+class NotificationConsumerTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.member = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        Membership.objects.create(user=self.member, club=self.club, status='approved')
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), "/ws/notifications/")
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    def _commit(self, create):
+        with self.captureOnCommitCallbacks(execute=True):
+            create()
+
+    async def test_new_notification_is_pushed_to_recipient(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+
+        await sync_to_async(self._commit)(lambda: Notification.objects.create(
+            user=self.member, club=self.club, content="Your membership request was approved",
+            kind=Notification.KIND_MEMBERSHIP_DECISION,
+        ))
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame['type'], 'notification')
+        self.assertEqual(frame['unread_delta'], 1)
+        self.assertEqual(frame['notification']['url'], reverse('club_detail', args=[self.club.id]))
+        await communicator.disconnect()
+
+    async def test_chat_activity_skips_own_messages(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+
+        await sync_to_async(self._commit)(lambda: Message.objects.create(
+            club=self.club, sender=self.member, content="Mine"
+        ))
+        self.assertTrue(await communicator.receive_nothing())
+        await sync_to_async(self._commit)(lambda: Message.objects.create(
+            club=self.club, sender=self.admin, content="Theirs"
+        ))
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame['type'], 'chat_activity')
+        self.assertEqual(frame['club_id'], self.club.id)
+        await communicator.disconnect()
+
+    @override_settings(CHAT_ACTIVITY_TICK=0.1)
+    def test_chat_activity_is_coalesced_per_club(self):
+        with patch('clubs.services.realtime.send_to_group') as send:
+            messages = []
+            for sender in (self.admin, self.admin, self.member, self.admin):
+                self._commit(lambda: messages.append(Message.objects.create(club=self.club, sender=sender, content="Hi")))
+            self.assertEqual(send.call_count, 1)
+            # The rest go out in one push at the end of the tick
+            time.sleep(0.3)
+        self.assertEqual(send.call_count, 2)
+        event = send.call_args.args[1]
+        self.assertEqual(event['senders'], {str(self.admin.id): 2, str(self.member.id): 1})
+        frame = json.loads(event['text'])
+        self.assertEqual((frame['message_id'], frame['new_messages']), (messages[-1].id, 3))
+
+    async def test_chat_activity_leaves_out_own_messages(self):
+        communicator, connected = await self._connect(self.member)
+        self.assertTrue(connected)
+        await get_channel_layer().group_send(club_activity_group(self.club.id), {
+            'type': 'club_activity',
+            'senders': {str(self.admin.id): 2, str(self.member.id): 1},
+            'text': json.dumps({'type': 'chat_activity', 'club_id': self.club.id, 'new_messages': 3}),
+        })
+        self.assertEqual((await communicator.receive_json_from())['new_messages'], 2)
+        await communicator.disconnect()
+
+
+class DatabaseSyncToAsyncTest(SimpleTestCase):
+    @override_settings(CHAT_DB_WORKERS=2)
+    async def test_calls_run_concurrently_on_worker_pool(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        @database_sync_to_async
+        def wait_for_other_call():
+            # Only returns if both calls are running at the same time
+            barrier.wait()
+            return threading.current_thread().name
+
+        names = await asyncio.gather(wait_for_other_call(), wait_for_other_call())
+        self.assertTrue(all(name.startswith('chat-db') for name in names))
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=2)
+class MessageHistoryViewTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        self.messages = [
+            Message.objects.create(club=self.club, sender=self.admin, content=f"Message {i}") for i in range(5)
+        ]
+        self.client.force_login(self.admin)
+
+    def test_messaging_renders_latest_page_only(self):
+        response = self.client.get(reverse('messaging', args=[self.club.id]))
+        self.assertEqual([m.id for m in response.context['chat_messages']], [m.id for m in self.messages[-2:]])
+        self.assertTrue(response.context['has_more_history'])
+
+    def test_history_pages_back_from_cursor(self):
+        url = reverse('message_history', args=[self.club.id])
+        data = self.client.get(url, {'before': self.messages[2].id}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [self.messages[0].id, self.messages[1].id])
+        self.assertFalse(data['has_more'])
+
+    def test_history_requires_membership(self):
+        outsider = User.objects.create_user(username="outsider", password="secret")
+        self.client.force_login(outsider)
+        response = self.client.get(reverse('message_history', args=[self.club.id]), {'before': self.messages[2].id})
+        self.assertEqual(response.status_code, 403)
+
+
+class ClubReadCursorTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.member = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        Message.objects.create(club=self.club, sender=self.admin, content="Before joining")
+        Membership.objects.create(user=self.member, club=self.club, status='approved')
+
+    def _unread(self, user):
+        return [(chat['club_id'], chat['unread']) for chat in ClubReadCursor.unread_summary(user)]
+
+    def test_messages_are_counted_on_read_without_notification_rows(self):
+        for i in range(3):
+            Message.objects.create(club=self.club, sender=self.admin, content=f"Message {i}")
+        Message.objects.create(club=self.club, sender=self.member, content="Own message")
+        self.assertEqual(self._unread(self.member), [(self.club.id, 3)])
+        self.assertEqual(self._unread(self.admin), [(self.club.id, 1)])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_opening_chat_and_marking_read_advance_cursors(self):
+        Message.objects.create(club=self.club, sender=self.admin, content="Hello")
+        self.client.force_login(self.member)
+        self.client.get(reverse('messaging', args=[self.club.id]))
+        self.assertEqual(self._unread(self.member), [])
+
+        Message.objects.create(club=self.club, sender=self.admin, content="Again")
+        self.client.post(reverse('mark_notifications_read'))
+        self.assertEqual(self._unread(self.member), [])
+
+    def test_cursor_removed_with_membership(self):
+        Membership.objects.filter(user=self.member).delete()
+        Message.objects.create(club=self.club, sender=self.admin, content="After leaving")
+        self.assertEqual(self._unread(self.member), [])
+
+    def test_only_approval_changes_touch_the_cursor(self):
+        membership = Membership.objects.get(user=self.member)
+        with patch.object(ClubReadCursor, 'start') as start:
+            membership.role = 'moderator'
+            membership.save()
+            membership.save()
+            start.assert_not_called()
+
+            membership.status = 'pending'
+            membership.save()
+            self.assertFalse(ClubReadCursor.objects.filter(user=self.member).exists())
+            membership.status = 'approved'
+            membership.save()
+            start.assert_called_once_with(self.member.id, self.club.id)
+
+
+class NotificationFanOutTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        self.members = [User.objects.create_user(username=f"member{i}", password="secret") for i in range(5)]
+        Membership.objects.bulk_create([Membership(user=m, club=self.club, status='approved') for m in self.members])
+
+    def test_event_fan_out_is_queued_after_commit(self):
+        with patch.object(fan_out_club_notification, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                event = Event.objects.create(club=self.club, title="Blitz", description="Games", event_date=timezone.now())
+                delay.assert_not_called()
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[:3], (self.club.id, Notification.KIND_EVENT, event.id))
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(NOTIFICATION_FANOUT_BATCH_SIZE=2)
+    def test_fan_out_is_batched_and_idempotent(self):
+        sender = self.members[0]
+        for _ in range(2):  # A retried task must not notify anyone twice
+            fan_out_club_notification(self.club.id, Notification.KIND_DOCUMENT, 1, "New document", sender.id)
+        notified = set(Notification.objects.values_list('user_id', flat=True))
+        self.assertEqual(notified, {self.admin.id} | {m.id for m in self.members[1:]})
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_documents_coalesce_into_one_unread_row(self):
+        uploader = self.members[0]
+        for document_id in (1, 2, 2):  # The repeated id is a retry and must not count twice
+            fan_out_club_notification(self.club.id, Notification.KIND_DOCUMENT, document_id,
+                                      f"New document {document_id}", uploader.id, uploader.id)
+        row = Notification.objects.get(user=self.admin)
+        self.assertEqual(row.count, 2)
+        self.assertEqual(row.content, "2 new documents in Chess Club, latest from member0")
+        self.assertEqual(Notification.objects.count(), 5)
+
+        Notification.objects.filter(user=self.admin).update(is_read=True)
+        fan_out_club_notification(self.club.id, Notification.KIND_DOCUMENT, 3, "New document 3",
+                                  uploader.id, uploader.id)
+        self.assertEqual(Notification.objects.filter(user=self.admin).count(), 2)
 
+    def test_retry_of_an_earlier_source_is_not_merged_again(self):
+        uploader = self.members[0]
+        for document_id in (1, 2, 1):  # Document 1's task is redelivered after document 2's ran
+            fan_out_club_notification(self.club.id, Notification.KIND_DOCUMENT, document_id,
+                                      f"New document {document_id}", uploader.id, uploader.id)
+        row = Notification.objects.get(user=self.admin)
+        self.assertEqual(row.count, 2)
+        self.assertEqual(row.content, "2 new documents in Chess Club, latest from member0")
+
+    def test_concurrent_fan_out_merges_into_the_row_that_won(self):
+        original = QuerySet.bulk_create
+        raced = []
+
+        def insert_after_rival(queryset, objs, *args, **kwargs):
+            if queryset.model is Notification and not raced:
+                raced.append(True)
+                # Document 2's fan-out inserts the unread row after document 1's looked for one
+                Notification.upsert([self.admin.id], self.club, Notification.KIND_DOCUMENT, "document:2", "New document 2")
+            return original(queryset, objs, *args, **kwargs)
+
+        with patch.object(QuerySet, 'bulk_create', autospec=True, side_effect=insert_after_rival):
+            new_ids = Notification.upsert([self.admin.id], self.club, Notification.KIND_DOCUMENT, "document:1",
+                                          "New document 1")
+        self.assertEqual(new_ids, [])
+        row = Notification.objects.get(user=self.admin)
+        self.assertEqual((row.count, row.source_key), (2, "document:1"))
+
+    def test_dropdown_renders_urls_from_one_query(self):
+        Notification.objects.create(user=self.admin, club=self.club, content="member0 has requested to join",
+                                    kind=Notification.KIND_MEMBERSHIP_REQUEST)
+        fan_out_club_notification(self.club.id, Notification.KIND_EVENT, 1, "New event", None)
+        with self.assertNumQueries(1):
+            urls = [n.get_absolute_url() for n in self.admin.notifications.all()[:10]]
+        self.assertEqual(urls, [reverse('event_list', args=[self.club.id]), reverse('admin_dashboard')])
+
+
+class UnreadCounterTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.member = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.create(user=self.member, club=self.club, status='approved')
+
+    def _context(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return unread_notifications(request)
+
+    def test_warm_context_costs_no_queries(self):
+        self._context(self.member)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._context(self.member)['unread_notifications_count'], 0)
+
+    def test_counter_follows_fan_out_messages_and_mark_read(self):
+        self._context(self.member)
+        fan_out_club_notification(self.club.id, Notification.KIND_DOCUMENT, 1, "New document", self.admin.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(club=self.club, sender=self.admin, content="Hello")
+        context = self._context(self.member)
+        self.assertEqual(context['unread_notifications_count'], 2)
+        self.assertEqual([chat['unread'] for chat in context['unread_chat_clubs']], [1])
+
+        self.client.force_login(self.member)
+        self.client.post(reverse('mark_notifications_read'))
+        context = self._context(self.member)
+        self.assertEqual(context['unread_notifications_count'], 0)
+        self.assertEqual(context['unread_chat_clubs'], [])
+
+    def test_late_callback_for_an_older_message_keeps_the_newer_latest_id(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Message.objects.create(club=self.club, sender=self.admin, content="First")
+        ClubReadCursor.advance(self.member.id, self.club.id, first.id)
+        self.assertEqual(self._context(self.member)['unread_chat_clubs'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(club=self.club, sender=self.admin, content="Second")
+        record_latest_message(self.club.id, first.id)  # The first message's callback, run late by another process
+        self.assertEqual([chat['unread'] for chat in self._context(self.member)['unread_chat_clubs']], [1])
+
+    def test_dropdown_fragment_is_cached_until_notifications_change(self):
+        self.client.force_login(self.member)
+        url = reverse('notification_dropdown')
+        self.assertContains(self.client.get(url), "No notifications yet.")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if 'clubs_notification' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.member, club=self.club, content="Approved",
+                                        kind=Notification.KIND_MEMBERSHIP_DECISION)
+        self.assertContains(self.client.get(url), reverse('club_detail', args=[self.club.id]))
+
+
+class NotificationPruneTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess enthusiasts", admin=self.user)
+
+    def _notification(self, days_old, is_read):
+        notification = Notification.objects.create(user=self.user, club=self.club, content="Note", is_read=is_read)
+        Notification.objects.filter(id=notification.id).update(timestamp=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def test_only_old_read_notifications_expire(self):
+        old_read = [self._notification(100, True) for _ in range(3)]
+        old_unread = self._notification(100, False)
+        recent_read = self._notification(1, True)
+
+        stats = prune_notifications(max_age_days=90, max_per_user=50, batch_size=2)
+        self.assertEqual(stats['expired'], 3)
+        self.assertFalse(Notification.objects.filter(id__in=[n.id for n in old_read]).exists())
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)), {old_unread.id, recent_read.id})
+
+    def test_per_user_cap_keeps_newest(self):
+        notifications = [self._notification(days_old, False) for days_old in range(5)]
+
+        stats = prune_notifications(max_age_days=90, max_per_user=2, batch_size=2)
+        self.assertEqual(stats['over_cap'], 3)
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)), {n.id for n in notifications[:2]})
+
+
+class HotQueryPlanTest(IsolatedCacheTestCase):
+    """EXPLAIN the hot queries at a seeded size and fail on any sequential scan of an app table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(400)])
+        clubs = Club.objects.bulk_create([
+            Club(name=f"Club {i}", description="Seeded", admin=users[i]) for i in range(20)
+        ])
+        Membership.objects.bulk_create([
+            Membership(user=user, club=club, status='approved' if (i + j) % 3 else 'pending')
+            for i, user in enumerate(users) for j, club in enumerate(clubs[:5])
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=users[i % len(users)], club=clubs[i % len(clubs)], content="Seeded", is_read=i % 4 != 0)
+            for i in range(5000)
+        ])
+        Message.bulk_ingest([
+            Message(club=clubs[i % 5], sender=users[i % 5 + 20], content="Seeded") for i in range(3000)
+        ])
+        now = timezone.now()
+        Event.objects.bulk_create([
+            Event(club=clubs[i % len(clubs)], title=f"Event {i}", description="Seeded",
+                  event_date=now + timedelta(days=i % 60), status='past' if i % 5 else 'upcoming',
+                  reminder_time='1day', reminder_sent=i % 5 != 0)
+            for i in range(2000)
+        ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        cls.user = users[30]
+        cls.club = clubs[0]
+
+    def _hot_queries(self):
+        user, club = self.user, self.club
+        return {
+            'unread notification count': Notification.objects.filter(user=user, is_read=False),
+            'notification dropdown': user.notifications.all()[:10],
+            'approved clubs': Club.objects.filter(memberships__user=user, memberships__status='approved'),
+            'pending requests': Membership.objects.filter(club=club, status='pending').select_related('user'),
+            'membership check': club.memberships.filter(user=user, status='approved'),
+            'approved members': club.memberships.filter(status='approved').select_related('user'),
+            'chat history page': club.messages.select_related('sender__profile').order_by('-timestamp', '-id')[:50],
+            'chat replay': club.messages.filter(id__gt=10).order_by('timestamp', 'id')[:50],
+            'read cursors': ClubReadCursor.objects.filter(user=user),
+            'unread chat summary': Message.objects.filter(
+                club__read_cursors__user=user, id__gt=F('club__read_cursors__last_read_id'),
+            ).exclude(sender=user).values('club_id').annotate(unread=Count('id')),
+            'upcoming events': club.upcoming_events(),
+            'calendar month': club.events_between(timezone.now(), timezone.now() + timedelta(days=31)),
+            'due event reminders': Event.objects.filter(
+                status='upcoming', reminder_sent=False, reminder_time__in=['15min', '1hour', '1day', '1week'],
+            ),
+        }
+
+    def _sequential_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            return re.findall(r'Seq Scan on (clubs_\w+|auth_user)', plan)
+        # SQLite: "SCAN <table>" without "USING ... INDEX" reads every row
+        return [line for line in plan.splitlines()
+                if re.search(r'\bSCAN (clubs_\w+|auth_user)\b', line) and 'INDEX' not in line]
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self._hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(self._sequential_scans(plan), [], f"{name} plan:\n{plan}")
+
+
+class AdminDashboardTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.members = [User.objects.create_user(username=f"member{i}", password="secret") for i in range(3)]
+        self.client.force_login(self.admin)
+
+    def _add_clubs(self, count):
+        for _ in range(count):
+            club = Club.objects.create(name=f"Club {Club.objects.count()}", description="Club", admin=self.admin)
+            Membership.objects.create(user=self.members[0], club=club, status='approved')
+            Membership.objects.create(user=self.members[1], club=club, status='pending')
+
+    def _dashboard_queries(self):
+        self.client.get(reverse('admin_dashboard'))  # Warm the navbar's unread caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_clubs(self):
+        self._add_clubs(2)
+        few = self._dashboard_queries()
+        self._add_clubs(8)
+        self.assertEqual(self._dashboard_queries(), few)
+
+    def test_stats_count_admin_once_and_are_cleared_on_change(self):
+        self._add_clubs(1)
+        club = Club.objects.get()
+        Membership.objects.create(user=self.admin, club=club, status='approved')
+        url = reverse('admin_dashboard_stats')
+        self.assertEqual(self.client.get(url).json(), {
+            'club_names': ["Club 0"], 'approved_counts': [2], 'pending_counts': [1],
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.filter(user=self.members[1]).get().delete()
+        self.assertEqual(self.client.get(url).json()['pending_counts'], [0])
+
+
+class ClubSearchTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        Club.objects.create(name="Chess Club", description="A place to enjoy chess", admin=self.admin)
+        Club.objects.create(name="Board Games", description="Chess, go and card games", admin=self.admin)
+        Club.objects.create(name="Drama Club", description="Let your acting skills shine", admin=self.admin)
+        self.client.force_login(self.admin)
+
+    def test_search_ranks_name_matches_first(self):
+        response = self.client.get(reverse('club_list') + '?q=ches')
+        self.assertEqual([club.name for club in response.context['clubs']], ["Chess Club", "Board Games"])
+
+    def test_search_follows_renames(self):
+        Club.objects.filter(name="Drama Club").update(name="Theatre Club")
+        response = self.client.get(reverse('club_list') + '?q=theatre')
+        self.assertEqual([club.name for club in response.context['clubs']], ["Theatre Club"])
+        self.assertContains(self.client.get(reverse('club_list') + '?q=drama'), "No clubs found.")
+
+    def test_autocomplete_matches_name_prefixes(self):
+        response = self.client.get(reverse('club_autocomplete') + '?q=ch')
+        self.assertEqual([club['name'] for club in response.json()['results']], ["Chess Club"])
+
+
+class KeysetPaginationTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        Club.objects.bulk_create([
+            Club(name=f"Club {i:02d}", description="Club", admin=self.admin) for i in range(25)
+        ])
+        self.client.force_login(self.admin)
+
+    def _page(self, cursor=None):
+        url = reverse('club_list') + (f'?cursor={cursor}' if cursor else '')
+        return self.client.get(url).context['page_obj']
+
+    def test_pages_walk_forward_and_back_in_name_order(self):
+        names, page, pages = [], self._page(), []
+        while True:
+            pages.append(page)
+            names += [club.name for club in page]
+            if not page.has_next():
+                break
+            page = self._page(page.next_cursor)
+        self.assertEqual(names, [f"Club {i:02d}" for i in range(25)])
+        self.assertEqual([p.number for p in pages], [1, 2, 3])
+        self.assertEqual(pages[-1].paginator.num_pages, 3)
+
+        previous = self._page(pages[-1].previous_cursor)
+        self.assertEqual(previous.number, 2)
+        self.assertEqual([club.name for club in previous], [club.name for club in pages[1]])
+
+    def test_total_is_counted_once_and_invalid_cursors_fall_back(self):
+        self._page()
+        with CaptureQueriesContext(connection) as queries:
+            page = self._page('not-a-cursor')
+        self.assertEqual(page.number, 1)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'clubs_club' in q['sql']])
+
+
+class UserClubSetTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.user = User.objects.create_user(username="member", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess", admin=self.admin)
+        self.other = Club.objects.create(name="Art Club", description="Art", admin=self.user)
+
+    def test_membership_checks_use_the_cached_set(self):
+        Membership.objects.create(user=self.user, club=self.club, status='approved')
+        self.assertTrue(self.club.is_user_member(self.user))
+        self.assertFalse(self.other.is_user_member(self.admin))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.club.is_user_member(self.user))
+            self.assertTrue(self.other.is_user_member(self.user))
+            self.assertFalse(self.other.is_user_member(self.admin))
+
+    def test_set_follows_membership_and_club_changes(self):
+        membership = Membership.objects.create(user=self.user, club=self.club, status='pending')
+        self.assertEqual(user_club_ids(self.user.id), {self.other.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.status = 'approved'
+            membership.save()
+        self.assertEqual(user_club_ids(self.user.id), {self.club.id, self.other.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.delete()
+            self.other.delete()
+        self.assertEqual(user_club_ids(self.user.id), set())
+
+    def test_reassigned_club_leaves_the_previous_admins_set(self):
+        self.assertEqual(user_club_ids(self.admin.id), {self.club.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.club.admin = self.user
+            self.club.save()
+        self.assertFalse(self.club.is_user_member(self.admin))
+        self.assertEqual(user_club_ids(self.user.id), {self.club.id, self.other.id})
+
+    def test_my_clubs_lists_member_and_admin_clubs(self):
+        Membership.objects.create(user=self.user, club=self.club, status='approved')
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('my_clubs'))
+        self.assertEqual(list(response.context['user_clubs']), [self.other, self.club])
+
+
+@override_settings(CLUB_ROSTER_PAGE_SIZE=3)
+class ClubRosterTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess", admin=self.admin)
+        self.client.force_login(self.admin)
+
+    def _add_members(self, count):
+        start = self.club.memberships.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f"member{i:02d}", password="secret")
+            Membership.objects.create(user=user, club=self.club, status='approved')
+
+    def _detail_queries(self):
+        url = reverse('club_detail', args=[self.club.id])
+        self.client.get(url)  # Warm the navbar's unread caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_detail_query_count_does_not_grow_with_members(self):
+        self._add_members(3)
+        response, few = self._detail_queries()
+        self.assertEqual(response.context['roster']['count'], 4)
+        self._add_members(20)
+        response, many = self._detail_queries()
+        self.assertEqual(many, few)
+        self.assertEqual(response.context['roster']['count'], 24)
+        self.assertEqual(len(response.context['roster']['members']), 7)
+        self.assertEqual(response.context['roster']['members'][0], self.admin)
+
+    def test_roster_pages_cover_every_member_once(self):
+        self._add_members(7)
+        Membership.objects.create(user=User.objects.create_user(username="waiting"), club=self.club)
+        url = reverse('club_roster', args=[self.club.id])
+
+        first = self.client.get(url).json()
+        self.assertEqual(first['admin']['username'], "admin")
+        self.assertEqual(first['count'], 8)
+        usernames = [member['username'] for member in first['members']]
+        cursor = first['next']
+        while cursor:
+            page = self.client.get(url, {'cursor': cursor}).json()
+            self.assertNotIn('admin', page)
+            usernames += [member['username'] for member in page['members']]
+            cursor = page['next']
+        self.assertEqual(usernames, [f"member{i:02d}" for i in range(7)])
+
+
+@override_settings(CLUB_UPCOMING_EVENTS=2)
+class EventCalendarTest(IsolatedCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="admin", password="secret")
+        self.club = Club.objects.create(name="Chess Club", description="Chess", admin=self.admin)
+        self.client.force_login(self.admin)
+        self.now = timezone.now()
+
+    def _event(self, title, days):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Event.objects.create(club=self.club, title=title, description="Match",
+                                        event_date=self.now + timedelta(days=days), reminder_time='none')
+
+    def test_club_detail_lists_only_the_next_upcoming_events(self):
+        self._event("Past", -3)
+        soon = self._event("Soon", 1)
+        later = self._event("Later", 2)
+        self._event("Much later", 30)
+        response = self.client.get(reverse('club_detail', args=[self.club.id]))
+        self.assertEqual(response.context['upcoming_events'], [soon, later])
+
+    def test_month_api_returns_the_window_and_revalidates(self):
+        event = self._event("Match", 0)
+        self._event("Next month", 40)
+        month = timezone.localtime(event.event_date).strftime('%Y-%m')
+        page = self.client.get(reverse('event_list', args=[self.club.id]), {'month': month})
+        self.assertEqual(list(page.context['events']), [event])
+        url = reverse('event_month', args=[self.club.id])
+
+        response = self.client.get(url, {'month': month})
+        self.assertEqual([e['title'] for e in response.json()['events']], ["Match"])
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, {'month': month}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.title = "Final"
+            event.save()
+        response = self.client.get(url, {'month': month}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['events'][0]['title'], "Final")
 
+    def test_out_of_range_months_fall_back_to_the_current_month(self):
+        current = timezone.localdate().strftime('%Y-%m')
+        for month in ("9999-12", "0001-01", "2024-13", "soon"):
+            with self.subTest(month):
+                response = self.client.get(reverse('event_month', args=[self.club.id]), {'month': month})
+                self.assertEqual(response.json()['month'], current)
+                self.assertEqual(self.client.get(reverse('event_list', args=[self.club.id]), {'month': month}).status_code, 200)
@@ -23,12 +23,18 @@ urlpatterns = [
 
     # 2) Clubs & Events URLs
     path('club_list/', views.club_list, name='club_list'),  # Moved from '/' to '/club-list/'
+    path('club_list/autocomplete/', views.club_autocomplete, name='club_autocomplete'),
     path('club/<int:club_id>/', views.club_detail, name='club_detail'),
+    path('club/<int:club_id>/presence/', views.club_presence, name='club_presence'),
+    path('club/<int:club_id>/roster/', views.club_roster, name='club_roster'),
     path('club/<int:club_id>/events/', views.event_list, name='event_list'),
+    path('club/<int:club_id>/events/month/', views.event_month, name='event_month'),
     path('event/<int:event_id>/', views.event_detail, name='event_detail'),
     path('club/<int:club_id>/messaging/', views.messaging, name='messaging'),
+    path('club/<int:club_id>/messages/history/', views.message_history, name='message_history'),
     # path('club/<int:club_id>/save_message/', views.save_message_ajax, name='save_message_ajax'), # Removed: Handled by WebSocket
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/stats/', views.admin_dashboard_stats, name='admin_dashboard_stats'),
     path('approve/<int:membership_id>/', views.approve_member, name='approve_member'),
     path('reject/<int:membership_id>/', views.reject_member, name='reject_member'),
 
@@ -86,5 +92,6 @@ urlpatterns = [
     ),
 
     path('mark_notifications_read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/dropdown/', views.notification_dropdown, name='notification_dropdown'),
 
 ]
@@ -6,31 +6,37 @@ from django.shortcuts import (
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.views import LogoutView,LoginView
-from .models import Club, Event, Membership,Profile, Notification, Document, GoogleCalendarToken, Message
+from .models import Club, ClubReadCursor, Event, Membership,Profile, Notification, Document, GoogleCalendarToken, Message
 from .forms import MessageForm, CustomUserCreationForm,ProfileForm,EventForm, DocumentForm
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.db.models import Count, F, Prefetch
 from django.http import HttpResponseForbidden, HttpResponse, JsonResponse
-from django.utils.safestring import mark_safe
-from django.views.decorators.http import require_POST
-import json
+from django.views.decorators.http import condition, require_POST
 from django.contrib.auth import login
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.text import Truncator
+from django.template.loader import render_to_string
 from django.db.models import Q
 from .services.google_calendar import GoogleCalendarService
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings as django_settings
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .services.dashboard import clubs_with_member_counts, membership_stats
+from .services.events import adjacent_months, events_changed_ns, events_last_modified, month_window, parse_month
+from .services.membership import user_club_ids
+from .services.pagination import KeysetPaginator, approximate_count
+from .services.presence import get_presence_registry, room_group_for_club
+from .services.realtime import push_notifications_read
+from .services.search import autocomplete_clubs, search_clubs
+from .services.unread import bump_notification_version, cached_notification_dropdown, reset_unread
 
 @login_required
 def my_clubs(request):
-    # Get clubs where user is a member (approved membership)
-    member_clubs = Club.objects.filter(memberships__user=request.user, memberships__status='approved')
-    
-    # Get clubs where user is the admin
-    admin_clubs = Club.objects.filter(admin=request.user)
-    
-    # Combine both querysets and remove duplicates
-    user_clubs = (member_clubs | admin_clubs).distinct().order_by('name')
+    # Clubs where the user is an approved member or the admin, from the cached id set
+    user_clubs = Club.objects.filter(id__in=user_club_ids(request.user.id)).order_by('name')
 
     return render(request, 'clubs/my_clubs.html', {'user_clubs': user_clubs})
 
@@ -119,18 +125,24 @@ def club_list(request):
 
     query = request.GET.get('q', '')  # Get 'q' parameter from request
     if query:  # If the user has searched for something
-        clubs = Club.objects.filter(name__icontains=query) | Club.objects.filter(description__icontains=query)
-    else:  # Otherwise, return all clubs
-        clubs = Club.objects.all().order_by('name')  # Default ordering
-
-    # Use paginator for paginating clubs
-    paginator = Paginator(clubs, 10)  # 10 clubs per page
-    page_number = request.GET.get('page')  # Get the page number from request
-    page_obj = paginator.get_page(page_number)
+        # Ranked full-text matches, paginated by offset in rank order
+        paginator = Paginator(search_clubs(query), 10)  # 10 clubs per page
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:  # Otherwise, all clubs by name, paginated by keyset with a cached or estimated total
+        clubs = Club.objects.all()
+        paginator = KeysetPaginator(clubs, 10, ordering=('name', 'id'),
+                                    count=lambda: approximate_count(clubs, 'club_list_count'))
+        page_obj = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'clubs/club_list.html',
                   {'page_obj': page_obj, 'clubs': page_obj.object_list, 'query': query})
 
+@login_required
+def club_autocomplete(request):
+    """Club names starting with the typed words, for the club_list search box."""
+    results = autocomplete_clubs(request.GET.get('q', ''))
+    return JsonResponse({'results': [{'id': club_id, 'name': name} for club_id, name in results]})
+
 
 
 @login_required
@@ -139,11 +151,11 @@ def club_detail(request, club_id):
     Shows details about a specific club.
     Allows a user to request membership if they haven't already.
     """
-    club = get_object_or_404(Club, id=club_id)
+    club = get_object_or_404(Club.objects.select_related('admin__profile'), id=club_id)
     membership = Membership.objects.filter(user=request.user, club=club).first()
     
-    # Get all members including the admin
-    all_members = club.get_all_members()
+    # The member count and the first few avatars; the full list is paged by club_roster
+    roster = club.roster_summary()
     
     if request.method == 'POST':
         # User is requesting to join the club
@@ -157,18 +169,117 @@ def club_detail(request, club_id):
     return render(request, 'clubs/club_detail.html', {
         'club': club, 
         'membership': membership,
-        'approved_memberships': all_members
+        'roster': roster,
+        'upcoming_events': list(club.upcoming_events(django_settings.CLUB_UPCOMING_EVENTS)),
     })
 
 
+def _roster_entry(user):
+    avatar_url = None
+    try:
+        if user.profile.profile_pic:
+            avatar_url = user.profile.profile_pic.url
+    except (Profile.DoesNotExist, ValueError):
+        pass
+    return {'id': user.id, 'username': user.username, 'avatar_url': avatar_url}
+
+
+@login_required
+def club_roster(request, club_id):
+    """
+    Returns a page of the club's approved members as JSON, ordered by username and paged
+    with the `next` cursor. The first page also carries the admin and the member count.
+    """
+    club = get_object_or_404(Club.objects.select_related('admin__profile'), id=club_id)
+    members = club.approved_members().annotate(username=F('user__username'))
+    paginator = KeysetPaginator(members, django_settings.CLUB_ROSTER_PAGE_SIZE, ordering=('username', 'id'))
+    page = paginator.get_page(request.GET.get('cursor'))
+
+    data = {
+        'members': [_roster_entry(membership.user) for membership in page],
+        'next': page.next_cursor,
+    }
+    if page.number == 1:
+        data['admin'] = _roster_entry(club.admin)
+        data['count'] = paginator.count + 1
+    return JsonResponse(data)
+
+
+@login_required
+def club_presence(request, club_id):
+    """
+    Returns who is online in the club's chat as JSON, read from the presence registry
+    without touching message tables. Non-members only see the count.
+    """
+    club = get_object_or_404(Club, id=club_id)
+    registry = get_presence_registry(get_channel_layer())
+    online = async_to_sync(registry.online)(room_group_for_club(club.id))
+
+    data = {'count': len(online)}
+    if club.is_user_member(request.user):
+        data['online'] = online
+    return JsonResponse(data)
+
+
+def _requested_month(request):
+    today = timezone.localdate()
+    return parse_month(request.GET.get('month')) or (today.year, today.month)
+
+
+def _events_etag(request, club_id):
+    year, month = _requested_month(request)
+    return f'"{club_id}-{year:04d}{month:02d}-{events_changed_ns(club_id)}"'
+
+
+def _events_last_modified(request, club_id):
+    return events_last_modified(club_id)
+
+
 @login_required
 def event_list(request, club_id):
     """
-    Lists events for a given club.
+    Lists a club's events one calendar month at a time (?month=YYYY-MM, the current month
+    by default). Month navigation is then loaded from event_month without a page reload.
     """
     club = get_object_or_404(Club, id=club_id)
-    events = club.events.all()
-    return render(request, 'clubs/event_list.html', {'club': club, 'events': events})
+    year, month = _requested_month(request)
+    start, end = month_window(year, month)
+    previous_month, next_month = adjacent_months(year, month)
+    return render(request, 'clubs/event_list.html', {
+        'club': club,
+        'events': club.events_between(start, end),
+        'month_start': start,
+        'previous_month': previous_month,
+        'next_month': next_month,
+    })
+
+
+@login_required
+@condition(etag_func=_events_etag, last_modified_func=_events_last_modified)
+def event_month(request, club_id):
+    """
+    Returns one calendar month of a club's events as JSON. Responses carry an ETag and
+    Last-Modified from the club's last event change, so revisited months answer 304.
+    """
+    club = get_object_or_404(Club, id=club_id)
+    year, month = _requested_month(request)
+    start, end = month_window(year, month)
+    previous_month, next_month = adjacent_months(year, month)
+    events = club.events_between(start, end).only('id', 'title', 'description', 'event_date', 'status')
+    return JsonResponse({
+        'month': f"{year:04d}-{month:02d}",
+        'label': start.strftime('%B %Y'),
+        'previous': previous_month,
+        'next': next_month,
+        'events': [{
+            'id': event.id,
+            'title': event.title,
+            'description': Truncator(event.description).words(15),
+            'date': timezone.localtime(event.event_date).isoformat(),
+            'status': event.status,
+            'url': reverse('event_detail', args=[event.id]),
+        } for event in events],
+    })
 
 
 @login_required
@@ -206,8 +317,10 @@ def messaging(request, club_id):
         message.save()
         return redirect('messaging', club_id=club.id)
 
-    # Fetch the messages for the club
-    messages_list = club.messages.order_by('timestamp')
+    # Render only the latest page of messages; older ones are loaded by message_history
+    messages_list, has_more_history = club.get_message_page(limit=django_settings.CHAT_HISTORY_PAGE_SIZE)
+    if messages_list:
+        ClubReadCursor.advance(request.user.id, club.id, messages_list[-1].id)
     
     # Fetch documents for the club
     documents = club.documents.all()
@@ -216,66 +329,65 @@ def messaging(request, club_id):
     return render(request, 'clubs/messaging.html', {
         'club': club,
         'chat_messages': messages_list,
+        'has_more_history': has_more_history,
         'documents': documents,
         'form': form,
         'room_name': room_name,  # Pass the room name to the template
     })
 
+@login_required
+def message_history(request, club_id):
+    """Return a page of chat messages older than the `before` message id as JSON."""
+    club = get_object_or_404(Club, id=club_id)
+    if not club.is_user_member(request.user):
+        return JsonResponse({'error': 'You must be an approved member to read messages.'}, status=403)
+
+    try:
+        before = int(request.GET['before'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'A numeric "before" message id is required.'}, status=400)
+
+    page, has_more = club.get_message_page(before=before, limit=django_settings.CHAT_HISTORY_PAGE_SIZE)
+    return JsonResponse({
+        'messages': [message.to_chat_payload() for message in page],
+        'has_more': has_more,
+    })
+
 @login_required
 def admin_dashboard(request):
     # Verify that the user is an admin of at least one club
-    user_clubs = Club.objects.filter(admin=request.user)
-    if not user_clubs.exists():
+    if not Club.objects.filter(admin=request.user).exists():
         messages.error(request, "You are not an admin of any clubs.")
         return redirect('club_list')
 
-    # Get all clubs where the user is the admin
-    clubs = user_clubs.exclude(id__isnull=True)
-    if not clubs.exists():
-        print("No clubs found for this user")
-
-    print("Clubs:", list(clubs.values()))  # Debugging output
-
-    # Pagination for clubs - 4 clubs per page (2x2 grid)
-    paginator = Paginator(clubs, 4)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # Get pending and approved memberships for each club on the current page
-    pending_memberships = {}
-    approved_members = {}
-    
-    for club in page_obj.object_list:
-        pending_memberships[club.id] = Membership.objects.filter(club=club, status='pending').select_related('user')
-        # Get all members including admin
-        approved_members[club.id] = club.get_all_members()
-
-    # Compute additional statistics for charts (all clubs, not just current page)
-    all_clubs = clubs  # Use all clubs for chart data
-    club_names = [club.name for club in all_clubs]  # Club names for Chart.js
-    approved_counts = []
-    pending_counts = []
-    
-    for club in all_clubs:
-        # Count all members including admin
-        approved_count = len(club.get_all_members())
-        pending_count = Membership.objects.filter(club=club, status='pending').count()
-        approved_counts.append(approved_count)
-        pending_counts.append(pending_count)
-
-    # Serialize the data securely for the frontend
+    # Member counts come from one annotated query; the pending requests of the clubs on
+    # the page are loaded with one more query instead of one per club
+    clubs = clubs_with_member_counts(request.user.id).select_related('admin').prefetch_related(
+        Prefetch(
+            'memberships',
+            queryset=Membership.objects.filter(status='pending').select_related('user'),
+            to_attr='pending_requests',
+        )
+    )
+
+    # Keyset pagination for clubs - 4 clubs per page (2x2 grid); the total is the cached chart's club count
+    paginator = KeysetPaginator(clubs, 4, ordering=('name', 'id'),
+                                count=lambda: len(membership_stats(request.user.id)['club_names']))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+
+    # The chart loads its series from admin_dashboard_stats
     context = {
         'clubs': page_obj.object_list,
         'page_obj': page_obj,
-        'pending_memberships': pending_memberships,
-        'approved_members': approved_members,
-        'club_names': mark_safe(json.dumps(club_names)),  # Safely pass club names as JSON
-        'approved_counts': mark_safe(json.dumps(approved_counts)),  # Approved members data
-        'pending_counts': mark_safe(json.dumps(pending_counts)),  # Pending members data
     }
 
     return render(request, 'clubs/admin_dashboard.html', context)
 
+@login_required
+def admin_dashboard_stats(request):
+    """Approved and pending member counts for every club the user administers, for the dashboard chart."""
+    return JsonResponse(membership_stats(request.user.id))
+
 
 @login_required
 def approve_member(request, membership_id):
@@ -347,8 +459,20 @@ def add_event(request, club_id):
 @require_POST
 def mark_notifications_read(request):
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    ClubReadCursor.mark_all_read(request.user.id)
+    reset_unread(request.user.id)
+    bump_notification_version([request.user.id])
+    push_notifications_read(request.user.id)
     return HttpResponse(status=204)
 
+@login_required
+def notification_dropdown(request):
+    """Notification dropdown items, loaded when the bell is opened rather than on every page."""
+    def render_items():
+        notifications = request.user.notifications.only('id', 'club_id', 'content', 'is_read', 'timestamp', 'kind')[:10]
+        return render_to_string('clubs/notification_dropdown.html', {'notifications': notifications})
+    return HttpResponse(cached_notification_dropdown(request.user.id, render_items))
+
 @login_required
 def upload_document(request, club_id):
     """Upload a document to a club."""